@@ -0,0 +1,88 @@
+#!/usr/bin/env bash
+set -euo pipefail
+
+# Load-test search-api against a throwaway Postgres+pgvector seeded with a synthetic wiki.
+#
+# Usage: scripts/bench.sh [previous-results.json]
+#
+# Env: BENCH_PAGES (1000), BENCH_LANGS (ru,en), BENCH_WORDS (400), BENCH_DUPLICATES (0.05),
+#      BENCH_CONCURRENCY (1,4,16), BENCH_REQUESTS (200), BENCH_KEEP=1 to leave the bench stack running.
+# BENCH_DB_PASS (password of the throwaway bench database) must be set in .env.
+# search-api knobs (VECTOR_INDEX, VECTOR_STORAGE, MEMORY_INDEX, MODEL_BACKEND, ...) are passed through.
+# No port is published: requests and the load generator run inside the bench search-api container.
+# Results are saved to data/bench/<timestamp>-<commit>.json.
+
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+PROJECT_ROOT="$(cd "${SCRIPT_DIR}/.." && pwd)"
+cd "${PROJECT_ROOT}"
+
+if [ -z "${BENCH_DB_PASS:-}" ] && ! grep -qE '^BENCH_DB_PASS=.+' .env 2>/dev/null; then
+  echo "BENCH_DB_PASS is not set: add it to .env (see .env.example)"
+  exit 1
+fi
+
+BENCH_PAGES="${BENCH_PAGES:-1000}"
+CONTAINER="coskb-bench-search-api"
+COMPARE="${1:-}"
+
+# api METHOD PATH: request to the bench search-api from inside its container.
+api() {
+  docker exec "${CONTAINER}" python -c \
+    "import sys, urllib.request; urllib.request.urlopen(urllib.request.Request('http://127.0.0.1:8000' + sys.argv[2], method=sys.argv[1])).read()" \
+    "$1" "$2"
+}
+
+cleanup() {
+  if [ "${BENCH_KEEP:-0}" != "1" ]; then
+    echo "Stopping bench stack..."
+    docker compose --profile bench rm -sf bench-search-api bench-postgres >/dev/null
+  fi
+}
+trap cleanup EXIT
+
+echo "Starting bench stack..."
+docker compose --profile bench up -d --build bench-postgres bench-search-api
+
+echo "Waiting for search-api /health/ready..."
+for _ in $(seq 1 150); do
+  if api GET /health/ready >/dev/null 2>&1; then
+    break
+  fi
+  sleep 2
+done
+api GET /health/ready >/dev/null 2>&1 || { echo "search-api did not become ready"; exit 1; }
+
+echo "Seeding ${BENCH_PAGES} synthetic pages..."
+docker exec -i \
+  -e BENCH_PAGES="${BENCH_PAGES}" \
+  -e BENCH_LANGS="${BENCH_LANGS:-ru,en}" \
+  -e BENCH_WORDS="${BENCH_WORDS:-400}" \
+  -e BENCH_DUPLICATES="${BENCH_DUPLICATES:-0.05}" \
+  "${CONTAINER}" python - < scripts/bench_seed_wiki.py
+
+echo "Indexing..."
+started=$(date +%s)
+api POST "/index?full=true&wait=true"
+echo "Indexed in $(( $(date +%s) - started ))s"
+
+commit="$(git rev-parse --short HEAD 2>/dev/null || echo unknown)"
+mkdir -p data/bench
+out="data/bench/$(date +%Y%m%d-%H%M%S)-${commit}.json"
+
+docker exec -i \
+  -e BENCH_COMPARE="$(if [ -n "${COMPARE}" ]; then cat "${COMPARE}"; fi)" \
+  "${CONTAINER}" python -u - \
+    --pages "${BENCH_PAGES}" \
+    --concurrency "${BENCH_CONCURRENCY:-1,4,16}" \
+    --requests "${BENCH_REQUESTS:-200}" \
+    --label "${commit}" \
+    < scripts/bench_load.py \
+  | tee /dev/stderr | sed -n 's/^RESULT //p' > "${out}.tmp"
+
+python3 - "${out}.tmp" "${out}" <<'PY'
+import json, sys
+with open(sys.argv[2], "w", encoding="utf-8") as f:
+    json.dump(json.loads(open(sys.argv[1], encoding="utf-8").read()), f, ensure_ascii=False, indent=2)
+PY
+rm -f "${out}.tmp"
+echo "Saved ${out}"
@@ -0,0 +1,125 @@
+"""Compare embedding backends (torch fp32 vs ONNX / ONNX int8): accuracy, latency, memory.
+
+Runs inside the search-api container and reads passages from published wiki pages:
+
+    docker exec -i coskb-search-api python - < scripts/bench_embedding_backend.py
+
+For every backend the script reports the cosine similarity of query and passage
+vectors to the fp32 reference, top-k overlap of query -> page rankings with the
+fp32 ranking, single-query latency and the RSS growth after loading the model.
+Backends are loaded one after another in the same process, so RSS numbers are
+approximate (freed torch memory is not always returned to the OS).
+
+Optional env: BENCH_BACKENDS (default "torch,onnx,onnx-int8"), BENCH_PAGES
+(default 200), BENCH_TOP_K (default 5), BENCH_REPEAT (default 20).
+"""
+from __future__ import annotations
+
+import gc
+import json
+import os
+import statistics
+import time
+
+import numpy as np
+
+from app import encoder
+from app.chunks import chunk_passage
+from app.db import get_raw_connection
+
+QUERIES = (
+    "vpn", "devcorp", "сфера", "sfera", "outlook", "сакура", "иннотех",
+    "токен", "rutoken", "поддержка втб", "vpn ext", "гк иннотех",
+    "как настроить почту", "не работает подключение к сети",
+)
+
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def load_passages(limit: int) -> list[str]:
+    conn = get_raw_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            'SELECT title, content FROM pages WHERE "isPublished" = true ORDER BY id LIMIT %s',
+            (limit,),
+        )
+        return [f"passage: {chunk_passage(title, (content or '')[:2000])}" for title, content in cur.fetchall()]
+    finally:
+        conn.close()
+
+
+def run_backend(backend: str, passages: list[str], repeat: int) -> dict:
+    gc.collect()
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    model = encoder.build_model(backend)
+    load_seconds = time.perf_counter() - started
+
+    query_texts = [f"query: {q}" for q in QUERIES]
+    queries = model.encode(query_texts, normalize_embeddings=True)
+    pages = model.encode(passages, normalize_embeddings=True, batch_size=32)
+
+    latencies = []
+    for _ in range(repeat):
+        for text in query_texts:
+            t0 = time.perf_counter()
+            model.encode(text, normalize_embeddings=True)
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    result = {
+        "backend": backend,
+        "load_seconds": round(load_seconds, 2),
+        "rss_mb": round(rss_mb() - rss_before, 1),
+        "query_ms_p50": round(statistics.median(latencies), 2),
+        "query_ms_p95": round(sorted(latencies)[int(len(latencies) * 0.95)], 2),
+    }
+    del model
+    gc.collect()
+    return {**result, "queries": queries, "pages": pages}
+
+
+def compare(reference: dict, candidate: dict, top_k: int) -> dict:
+    query_cos = np.sum(reference["queries"] * candidate["queries"], axis=1)
+    page_cos = np.sum(reference["pages"] * candidate["pages"], axis=1)
+    ref_rank = np.argsort(-(reference["queries"] @ reference["pages"].T), axis=1)[:, :top_k]
+    cand_rank = np.argsort(-(candidate["queries"] @ candidate["pages"].T), axis=1)[:, :top_k]
+    overlap = [len(set(r) & set(c)) / top_k for r, c in zip(ref_rank, cand_rank)]
+    top1 = [r[0] == c[0] for r, c in zip(ref_rank, cand_rank)]
+    return {
+        "query_cos_min": round(float(query_cos.min()), 4),
+        "query_cos_mean": round(float(query_cos.mean()), 4),
+        "page_cos_min": round(float(page_cos.min()), 4),
+        "page_cos_mean": round(float(page_cos.mean()), 4),
+        f"top{top_k}_overlap": round(float(np.mean(overlap)), 3),
+        "top1_agreement": round(float(np.mean(top1)), 3),
+    }
+
+
+def main() -> None:
+    backends = [b.strip() for b in os.environ.get("BENCH_BACKENDS", "torch,onnx,onnx-int8").split(",")]
+    if "torch" not in backends:
+        backends.insert(0, "torch")
+    top_k = int(os.environ.get("BENCH_TOP_K", "5"))
+    repeat = int(os.environ.get("BENCH_REPEAT", "20"))
+    passages = load_passages(int(os.environ.get("BENCH_PAGES", "200")))
+    if len(passages) < top_k:
+        raise SystemExit("Not enough published wiki pages")
+
+    runs = {backend: run_backend(backend, passages, repeat) for backend in backends}
+    reference = runs["torch"]
+    for backend, run in runs.items():
+        row = {k: v for k, v in run.items() if k not in ("queries", "pages")}
+        if backend != "torch":
+            row.update(compare(reference, run, top_k))
+        print(json.dumps(row, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Passage encoding throughput (pages/sec) vs. number of index worker processes.
+
+Runs inside the search-api container, without touching the database:
+
+    docker exec -i coskb-search-api python - < scripts/bench_index_workers.py
+
+Optional env: BENCH_PAGES (default 512), BENCH_WORKERS (default "0,1,2,4"),
+BENCH_TORCH_THREADS (default 1), BENCH_CHUNK (default 64).
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import random
+import time
+
+from app import encoder
+
+WORDS = (
+    "настройка подключения vpn сервер адрес домен пароль учетная запись токен "
+    "драйвер установка outlook почта сфера задачи документы поддержка обращение "
+    "the client certificate network access agent install update configure"
+).split()
+
+
+def synthetic_pages(count: int, words_per_page: int = 350) -> list[str]:
+    rnd = random.Random(42)
+    return [
+        f"Страница {i}\n" + " ".join(rnd.choice(WORDS) for _ in range(words_per_page))
+        for i in range(count)
+    ]
+
+
+async def run(pages: list[str], processes: int, torch_threads: int, chunk: int) -> dict:
+    workers = None
+    started = time.perf_counter()
+    if processes > 0:
+        workers = encoder.open_passage_workers(processes, torch_threads)
+        # Warm every worker so model loading is not counted as throughput.
+        await encoder.encode_passages_parallel(workers, processes, pages[:processes])
+    else:
+        encoder.load_model()
+    startup = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for i in range(0, len(pages), chunk):
+        texts = pages[i:i + chunk]
+        if workers is None:
+            await encoder.run_encode(encoder.encode_passages, texts)
+        else:
+            await encoder.encode_passages_parallel(workers, processes, texts)
+    elapsed = time.perf_counter() - started
+    if workers is not None:
+        workers.shutdown()
+    return {
+        "processes": processes,
+        "torch_threads": torch_threads if processes else None,
+        "startup_seconds": round(startup, 2),
+        "encode_seconds": round(elapsed, 2),
+        "pages_per_sec": round(len(pages) / elapsed, 2),
+    }
+
+
+def main():
+    count = int(os.environ.get("BENCH_PAGES", "512"))
+    worker_counts = [int(x) for x in os.environ.get("BENCH_WORKERS", "0,1,2,4").split(",")]
+    torch_threads = int(os.environ.get("BENCH_TORCH_THREADS", "1"))
+    chunk = int(os.environ.get("BENCH_CHUNK", "64"))
+    pages = synthetic_pages(count)
+
+    results = [asyncio.run(run(pages, n, torch_threads, chunk)) for n in worker_counts]
+    print(f"{'processes':>9} {'pages/sec':>10} {'encode s':>9} {'startup s':>10}")
+    for r in results:
+        label = "in-proc" if r["processes"] == 0 else str(r["processes"])
+        print(f"{label:>9} {r['pages_per_sec']:>10} {r['encode_seconds']:>9} {r['startup_seconds']:>10}")
+    print(json.dumps({"pages": count, "chunk": chunk, "results": results}, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
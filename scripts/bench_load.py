@@ -0,0 +1,198 @@
+"""Load test for search-api: QPS, p50/p95/p99 latency and RSS at fixed concurrency.
+
+Runs inside the bench search-api container (see scripts/bench.sh), so no port
+has to be published; standard library only:
+
+    docker exec -i [-e BENCH_COMPARE="$(cat data/bench/previous.json)"] \\
+        coskb-bench-search-api python -u - --pages 1000 < scripts/bench_load.py
+
+Scenarios: /search in fts, vector and hybrid modes, /similar and /duplicates,
+each at every --concurrency level. Queries are drawn from a seeded pool, so
+runs are repeatable. Every scenario and level continues where the previous
+one stopped in the pool, so a level does not replay queries an earlier one
+left in the result and embedding caches; by default the pool has one query
+per request, a smaller --query-pool makes queries repeat (cache hits).
+RSS of the server (PID 1 of the container) is read from /proc/1/status after
+each run. With BENCH_COMPARE set to a previous report, deltas are printed.
+The last line of output is "RESULT <json>".
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+
+QUERY_WORDS = (
+    "vpn outlook сфера сакура токен jira confluence gitlab wi-fi sso настройка подключения "
+    "пароль почта доступ сертификат ошибка инструкция configure password access certificate "
+    "error guide install account network"
+).split()
+
+
+def query_pool(size: int, seed: int = 7) -> list[str]:
+    """size distinct queries of 1-3 words (word combinations run out at ~60k)."""
+    rnd = random.Random(seed)
+    pool: dict[str, None] = {}
+    attempts = 0
+    while len(pool) < size and attempts < size * 20:
+        pool[" ".join(rnd.sample(QUERY_WORDS, rnd.randint(1, 3)))] = None
+        attempts += 1
+    return list(pool)
+
+
+def percentile(values: list[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def fetch(url: str, timeout: float) -> tuple[float, bool]:
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as r:
+            r.read()
+        ok = True
+    except (urllib.error.URLError, TimeoutError, ConnectionError):
+        ok = False
+    return (time.perf_counter() - started) * 1000, ok
+
+
+def server_rss() -> dict:
+    try:
+        with open("/proc/1/status", encoding="utf-8") as f:
+            status = f.read()
+    except OSError:
+        return {"rss_mb": None, "rss_peak_mb": None}
+    values = {line.split(":")[0]: int(line.split()[1]) for line in status.splitlines()
+              if line.startswith(("VmRSS:", "VmHWM:"))}
+    return {
+        "rss_mb": round(values.get("VmRSS", 0) / 1024, 1),
+        "rss_peak_mb": round(values.get("VmHWM", 0) / 1024, 1),
+    }
+
+
+def run_scenario(base: str, name: str, make_url, concurrency: int, requests: int, offset: int,
+                 timeout: float) -> dict:
+    urls = [base + make_url(offset + i) for i in range(requests)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(lambda u: fetch(u, timeout), urls))
+    elapsed = time.perf_counter() - started
+    latencies = [ms for ms, ok in results if ok]
+    row = {
+        "scenario": name,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": sum(1 for _, ok in results if not ok),
+        "qps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(statistics.median(latencies), 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95), 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99), 2) if latencies else None,
+        **server_rss(),
+    }
+    print(f"{name:<16} c={concurrency:<3} qps={row['qps']:<8} p50={row['p50_ms']} "
+          f"p95={row['p95_ms']} p99={row['p99_ms']} errors={row['errors']} rss={row['rss_mb']}MB")
+    return row
+
+
+def scenarios(pages: int, pool: list[str], top_k: int) -> list[tuple[str, object, float]]:
+    """(name, i -> path, share of --requests) for every benchmarked endpoint."""
+    def search(mode):
+        return lambda i: "/search?" + urlencode({"q": pool[i % len(pool)], "mode": mode, "top_k": top_k})
+
+    def page_id(i: int) -> int:
+        return random.Random(i).randint(1, pages)
+
+    return [
+        ("search_fts", search("fts"), 1.0),
+        ("search_vector", search("vector"), 1.0),
+        ("search_hybrid", search("hybrid"), 1.0),
+        ("similar", lambda i: "/similar?" + urlencode({"page_id": page_id(i), "top_k": top_k}), 1.0),
+        # Whole-corpus scan: a small share of requests keeps the run short.
+        ("duplicates", lambda i: "/duplicates?" + urlencode({"threshold": 0.95, "groups": "true"}), 0.05),
+    ]
+
+
+def compare(previous: dict, current: dict):
+    old = {(r["scenario"], r["concurrency"]): r for r in previous["results"]}
+    print(f"\nvs {previous['meta'].get('label') or previous['meta'].get('started_at')}")
+    print(f"{'scenario':<16} {'c':>3} {'qps':>10} {'Δqps %':>8} {'p95 ms':>9} {'Δp95 %':>8}")
+    for r in current["results"]:
+        o = old.get((r["scenario"], r["concurrency"]))
+        if not o or not o["qps"] or not o["p95_ms"] or r["p95_ms"] is None:
+            continue
+        dq = (r["qps"] - o["qps"]) / o["qps"] * 100
+        dp = (r["p95_ms"] - o["p95_ms"]) / o["p95_ms"] * 100
+        print(f"{r['scenario']:<16} {r['concurrency']:>3} {r['qps']:>10} {dq:>+8.1f} {r['p95_ms']:>9} {dp:>+8.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--pages", type=int, required=True, help="Seeded page count (page ids 1..N)")
+    parser.add_argument("--concurrency", default="1,4,16")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario and level")
+    parser.add_argument("--query-pool", type=int, default=0,
+                        help="Distinct queries (default: one per request, no repeats)")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--label", default="", help="Free-form run label, e.g. git commit")
+    args = parser.parse_args()
+
+    levels = [int(c) for c in args.concurrency.split(",")]
+    pool: list[str] = []  # filled below, once the number of requests is known
+    plan = [
+        (name, make_url, max(levels[-1], int(args.requests * share)))
+        for name, make_url, share in scenarios(args.pages, pool, args.top_k)
+    ]
+    pool_size = args.query_pool or sum(requests for _, _, requests in plan) * len(levels)
+    pool += query_pool(pool_size)
+    with urllib.request.urlopen(args.url + "/vector-index", timeout=30) as r:
+        vector_index = json.loads(r.read())
+    with urllib.request.urlopen(args.url + "/encoder-stats", timeout=30) as r:
+        encoder_stats = json.loads(r.read())
+    with urllib.request.urlopen(args.url + "/cache-stats", timeout=30) as r:
+        result_cache = json.loads(r.read())
+
+    report = {
+        "meta": {
+            "label": args.label,
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "pages": args.pages,
+            "requests": args.requests,
+            "query_pool": pool_size,
+            "top_k": args.top_k,
+            "vector_index": vector_index.get("configured"),
+            "vector_storage": vector_index.get("storage"),
+            "memory_index": vector_index.get("memory") is not None,
+            "model_backend": encoder_stats.get("backend"),
+            "result_cache_size": result_cache.get("max_size"),
+            "result_cache_ttl": result_cache.get("ttl_seconds"),
+            "query_cache_size": encoder_stats.get("query_cache", {}).get("max_size"),
+            **server_rss(),
+        },
+        "results": [],
+    }
+    offset = 0
+    for name, make_url, requests in plan:
+        for concurrency in levels:
+            report["results"].append(
+                run_scenario(args.url, name, make_url, concurrency, requests, offset, args.timeout)
+            )
+            offset += requests
+
+    previous = os.environ.get("BENCH_COMPARE", "")
+    if previous.strip():
+        compare(json.loads(previous), report)
+    print("RESULT " + json.dumps(report, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Seed the benchmark database with a synthetic Wiki.js-like `pages` table.
+
+Runs inside the bench search-api container (see scripts/bench.sh):
+
+    docker exec -i coskb-bench-search-api python - < scripts/bench_seed_wiki.py
+
+Only the columns search-api reads are created (id, title, path, content,
+"isPublished", "updatedAt"). Existing pages are replaced. The generator is
+seeded, so the same settings always produce the same wiki.
+
+Optional env: BENCH_PAGES (default 1000), BENCH_LANGS (default "ru,en"),
+BENCH_WORDS (default 400, words per page), BENCH_DUPLICATES (default 0.05,
+share of near-duplicate pages), BENCH_SEED (default 42).
+"""
+from __future__ import annotations
+
+import json
+import os
+import random
+
+from app.db import get_raw_connection
+
+VOCABULARY = {
+    "ru": (
+        "настройка подключения сервер адрес домен пароль учетная запись токен драйвер "
+        "установка почта сфера задачи документы поддержка обращение сеть доступ клиент "
+        "сертификат агент обновление ошибка инструкция рабочее место удаленный вход "
+        "политика безопасности принтер календарь встреча отчет согласование заявка"
+    ).split(),
+    "en": (
+        "configure connection server address domain password account token driver "
+        "install mail tasks documents support request network access client "
+        "certificate agent update error guide workstation remote login policy "
+        "security printer calendar meeting report approval ticket"
+    ).split(),
+}
+
+TOPICS = ("VPN", "Outlook", "Сфера", "Сакура", "Токен", "Jira", "Confluence", "GitLab", "Wi-Fi", "SSO")
+
+
+def make_page(rnd: random.Random, page_id: int, lang: str, words: int) -> tuple[str, str, str]:
+    topic = rnd.choice(TOPICS)
+    vocab = VOCABULARY[lang]
+    title = f"{topic}: {' '.join(rnd.sample(vocab, 3))}"
+    paragraphs = []
+    remaining = words
+    while remaining > 0:
+        size = min(remaining, rnd.randint(30, 80))
+        paragraphs.append(" ".join(rnd.choice(vocab) for _ in range(size)).capitalize() + ".")
+        remaining -= size
+    content = f"# {title}\n\n{topic}\n\n" + "\n\n".join(paragraphs)
+    return title, f"{lang}/{topic.lower()}/page-{page_id}", content
+
+
+def main() -> None:
+    count = int(os.environ.get("BENCH_PAGES", "1000"))
+    langs = [lang.strip() for lang in os.environ.get("BENCH_LANGS", "ru,en").split(",")]
+    words = int(os.environ.get("BENCH_WORDS", "400"))
+    duplicates = float(os.environ.get("BENCH_DUPLICATES", "0.05"))
+    rnd = random.Random(int(os.environ.get("BENCH_SEED", "42")))
+
+    rows = []
+    for page_id in range(1, count + 1):
+        if rows and rnd.random() < duplicates:
+            # Near-duplicate of an earlier page: same text with a changed tail.
+            _, title, path, content, _, _ = rnd.choice(rows)
+            title, path = f"{title} (копия)", f"{path}-copy-{page_id}"
+            content = content[: int(len(content) * 0.9)] + " " + rnd.choice(TOPICS)
+        else:
+            title, path, content = make_page(rnd, page_id, rnd.choice(langs), words)
+        rows.append((page_id, title, path, content, True, "2024-01-01T00:00:00.000Z"))
+
+    conn = get_raw_connection()
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS pages (
+            id INTEGER PRIMARY KEY,
+            title TEXT NOT NULL,
+            path TEXT NOT NULL,
+            content TEXT,
+            "isPublished" BOOLEAN NOT NULL DEFAULT true,
+            "updatedAt" TEXT
+        )
+    """)
+    cur.execute("TRUNCATE pages")
+    with cur.copy('COPY pages (id, title, path, content, "isPublished", "updatedAt") FROM STDIN') as copy:
+        for row in rows:
+            copy.write_row(row)
+    conn.commit()
+    conn.close()
+    print(json.dumps({"pages": count, "langs": langs, "words": words, "duplicates": duplicates}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Index size, latency and recall@k of each VECTOR_STORAGE layout (vector, halfvec, binary).
+
+Runs inside the search-api container against the indexed ai.embeddings (or ai.chunks):
+
+    docker exec -i coskb-search-api python - < scripts/bench_vector_storage.py
+
+For each layout a fresh ANN index is built inside a transaction that is rolled
+back at the end, so the live schema is not changed (index builds block writes
+to the table while they run). Sequential scans are disabled in that
+transaction and every query shape is EXPLAINed first: the run stops unless the
+plan uses the bench index (or the live index of the same method and layout,
+which has the same definition). Ground truth is exact fp32 cosine search in NumPy.
+For compact layouts recall is reported for the first pass alone and with fp32
+rescoring of RESCORE_CANDIDATES candidates.
+
+Optional env: BENCH_TABLE (ai.embeddings or ai.chunks), BENCH_TOP_K (default 10),
+BENCH_RESCORE (default RESCORE_CANDIDATES), BENCH_STORAGES (default all).
+"""
+from __future__ import annotations
+
+import json
+import os
+import time
+
+import numpy as np
+from pgvector.psycopg import register_vector
+
+from app import encoder, vector_index
+from app.config import HNSW_EF_SEARCH, IVFFLAT_PROBES, RESCORE_CANDIDATES, VECTOR_INDEX
+from app.db import get_raw_connection
+
+QUERIES = (
+    "vpn", "devcorp", "сфера", "sfera", "outlook", "сакура", "иннотех",
+    "токен", "rutoken", "поддержка втб", "vpn ext", "гк иннотех",
+    "как настроить почту", "не работает подключение к сети",
+)
+
+KEYS = {"ai.embeddings": "page_id", "ai.chunks": "id"}
+
+
+def recall(found: list[list[int]], truth: list[list[int]]) -> float:
+    return float(np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)]))
+
+
+def plan_indexes(plan: dict) -> set[str]:
+    names = {plan["Index Name"]} if "Index Name" in plan else set()
+    for child in plan.get("Plans", []):
+        names |= plan_indexes(child)
+    return names
+
+
+def check_plan(cur, sql: str, vec: np.ndarray, top_k: int, expected: set[str]) -> str:
+    """Name of the index the query plan uses; exits unless it is one of expected."""
+    cur.execute("EXPLAIN (FORMAT JSON) " + sql, {"vec": vec, "k": top_k})
+    used = plan_indexes(cur.fetchone()[0][0]["Plan"])
+    if not used & expected:
+        raise SystemExit(f"Plan does not use {sorted(expected)} (uses {sorted(used) or 'no index'}):\n{sql}")
+    return sorted(used & expected)[0]
+
+
+def run_queries(cur, sql: str, vectors: np.ndarray, top_k: int) -> tuple[list[list[int]], float]:
+    found, started = [], time.perf_counter()
+    for vec in vectors:
+        cur.execute(sql, {"vec": vec, "k": top_k})
+        found.append([r[0] for r in cur.fetchall()])
+    return found, (time.perf_counter() - started) * 1000 / len(vectors)
+
+
+def main() -> None:
+    table = os.environ.get("BENCH_TABLE", "ai.embeddings")
+    key = KEYS[table]
+    top_k = int(os.environ.get("BENCH_TOP_K", "10"))
+    rescore = int(os.environ.get("BENCH_RESCORE", str(RESCORE_CANDIDATES)))
+    storages = os.environ.get("BENCH_STORAGES", ",".join(vector_index.STORAGES)).split(",")
+    method = VECTOR_INDEX if VECTOR_INDEX in vector_index.METHODS else "hnsw"
+
+    encoder.load_model()
+    queries = np.asarray(encoder.encode_queries(list(QUERIES)), dtype=np.float32)
+
+    conn = get_raw_connection()
+    register_vector(conn)
+    cur = conn.cursor()
+    cur.execute(f"SELECT {key}, embedding FROM {table} ORDER BY {key}")
+    rows = cur.fetchall()
+    if len(rows) < top_k:
+        raise SystemExit(f"Not enough rows in {table}, run POST /index first")
+    ids = np.array([r[0] for r in rows])
+    matrix = np.vstack([np.asarray(r[1], dtype=np.float32) for r in rows])
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    truth = [list(ids[np.argsort(-scores)[:top_k]]) for scores in queries @ matrix.T]
+
+    cur.execute("SELECT pg_relation_size(%s::regclass)", (table,))
+    print(json.dumps({"table": table, "rows": len(rows), "heap_bytes": cur.fetchone()[0]}))
+
+    limit = max(HNSW_EF_SEARCH, rescore, top_k)
+    cur.execute("SELECT set_config('hnsw.ef_search', %s, false)", (str(limit),))
+    cur.execute("SELECT set_config('ivfflat.probes', %s, false)", (str(IVFFLAT_PROBES),))
+    cur.execute("SET LOCAL enable_seqscan = off")
+    for storage in storages:
+        name = f"bench_{storage}"
+        started = time.perf_counter()
+        cur.execute(vector_index.create_index_sql(table, name, storage=storage))
+        build_seconds = time.perf_counter() - started
+        cur.execute("SELECT pg_relation_size(%s::regclass)", (f"ai.{name}",))
+        size = cur.fetchone()[0]
+
+        expected = {name, vector_index.index_name(table, method, storage)}
+        first_sql = vector_index.nearest_sql(table, key, "k", storage, rescore=0)
+        used = check_plan(cur, first_sql, queries[0], top_k, expected)
+        first_pass, first_ms = run_queries(cur, first_sql, queries, top_k)
+        result = {
+            "storage": storage,
+            "method": method,
+            "index": used,
+            "index_bytes": size,
+            "build_seconds": round(build_seconds, 2),
+            f"recall@{top_k}": round(recall(first_pass, truth), 3),
+            "query_ms": round(first_ms, 2),
+        }
+        if storage != "vector":
+            rescored_sql = vector_index.nearest_sql(table, key, "k", storage, rescore=rescore)
+            check_plan(cur, rescored_sql, queries[0], top_k, expected)
+            rescored, rescored_ms = run_queries(cur, rescored_sql, queries, top_k)
+            result.update({
+                "rescore_candidates": rescore,
+                f"rescored_recall@{top_k}": round(recall(rescored, truth), 3),
+                "rescored_query_ms": round(rescored_ms, 2),
+            })
+        print(json.dumps(result))
+        cur.execute(f"DROP INDEX ai.{name}")
+
+    conn.rollback()
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
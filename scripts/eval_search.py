@@ -0,0 +1,196 @@
+"""Offline retrieval-quality report: recall@k, MRR and nDCG@k per search mode, next to latency.
+
+Runs inside the search-api container against the indexed wiki (see scripts/eval_search.sh):
+
+    docker exec -i -e EVAL_QUERIES="$(cat data/eval/search_queries.json)" \\
+        coskb-search-api python - < scripts/eval_search.py
+
+Every labelled query goes through app.main.run_search in-process (no HTTP, no
+result cache), so the numbers reflect the active config: FTS_WEIGHT,
+VECTOR_WEIGHT, MIN_SCORE_*, HYBRID_CANDIDATES, VECTOR_INDEX/VECTOR_STORAGE,
+MEMORY_INDEX, CHUNKS_ENABLED, MODEL_BACKEND. Pass other values with `-e` to
+compare configs. The query embedding cache is cleared before every call, so
+latency includes encoding.
+
+A result is relevant when its title contains one of the labelled title
+fragments (case-insensitive); the fragment's grade is the gain for nDCG.
+
+Optional env: EVAL_TOP_K (default 5), EVAL_REPEATS (default 3, latency runs per
+query), EVAL_MODES (default fts,vector,hybrid,hybrid-rrf), EVAL_EF_SEARCH and
+EVAL_PROBES (comma-separated values to sweep for the vector and hybrid modes).
+The last line of output is "RESULT <json>".
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import math
+import os
+import statistics
+import time
+
+from app import config, db, encoder, memory_index, metrics
+from app.main import run_search
+
+# name -> (run_search mode, fusion)
+MODES = {
+    "fts": ("fts", "weighted"),
+    "vector": ("vector", "weighted"),
+    "hybrid": ("hybrid", "weighted"),
+    "hybrid-rrf": ("hybrid", "rrf"),
+}
+
+CONFIG_KEYS = (
+    "FTS_WEIGHT", "VECTOR_WEIGHT", "RRF_K", "MIN_SCORE_HYBRID", "MIN_SCORE_VECTOR", "MIN_SCORE_FTS",
+    "HYBRID_CANDIDATES", "VECTOR_INDEX", "HNSW_EF_SEARCH", "IVFFLAT_PROBES", "VECTOR_STORAGE",
+    "RESCORE_CANDIDATES", "MEMORY_INDEX", "CHUNKS_ENABLED", "CHUNK_AGGREGATE", "MODEL_BACKEND",
+)
+
+
+def grades_for(results: list[dict], relevant: dict[str, int]) -> list[int]:
+    """Relevance grade of each result, 0 when it matches no labelled title.
+
+    Each label is credited once, so duplicate pages cannot push nDCG above 1.
+    """
+    unused = {fragment.lower(): grade for fragment, grade in relevant.items()}
+    grades = []
+    for r in results:
+        title = (r.get("title") or "").lower()
+        matches = [fragment for fragment in unused if fragment in title]
+        best = max(matches, key=unused.get, default=None)
+        grades.append(unused.pop(best) if best is not None else 0)
+    return grades
+
+
+def recall_at_k(results: list[dict], relevant: dict[str, int]) -> float:
+    titles = [(r.get("title") or "").lower() for r in results]
+    found = sum(1 for fragment in relevant if any(fragment.lower() in t for t in titles))
+    return found / len(relevant)
+
+
+def reciprocal_rank(grades: list[int]) -> float:
+    return next((1 / (i + 1) for i, g in enumerate(grades) if g > 0), 0.0)
+
+
+def ndcg_at_k(grades: list[int], relevant: dict[str, int], k: int) -> float:
+    def dcg(gains):
+        return sum((2 ** g - 1) / math.log2(i + 2) for i, g in enumerate(gains))
+
+    ideal = dcg(sorted(relevant.values(), reverse=True)[:k])
+    return dcg(grades[:k]) / ideal if ideal else 0.0
+
+
+def percentile(values: list[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def variants(modes: list[str]) -> list[tuple[str, int | None, int | None]]:
+    """(mode, ef_search, probes) rows of the report; sweeps apply to modes that use the ANN index."""
+    ef_values = [int(v) for v in os.environ.get("EVAL_EF_SEARCH", "").split(",") if v]
+    probe_values = [int(v) for v in os.environ.get("EVAL_PROBES", "").split(",") if v]
+    rows = []
+    for mode in modes:
+        rows.append((mode, None, None))
+        if MODES[mode][0] == "fts":
+            continue
+        rows += [(mode, ef, None) for ef in ef_values]
+        rows += [(mode, None, probes) for probes in probe_values]
+    return rows
+
+
+async def evaluate(queries: list[dict], mode: str, ef_search: int | None, probes: int | None,
+                   top_k: int, repeats: int) -> dict:
+    search_mode, fusion = MODES[mode]
+    recalls, rrs, ndcgs, latencies, misses = [], [], [], [], []
+    stage_ms: dict[str, float] = {}
+    for item in queries:
+        results = []
+        for _ in range(repeats):
+            encoder.query_cache.clear()
+            stages = metrics.Stages()
+            started = time.perf_counter()
+            results = await run_search(item["query"], search_mode, top_k, fusion, ef_search, probes,
+                                       stages=stages)
+            latencies.append((time.perf_counter() - started) * 1000)
+            for stage, ms in stages.ms.items():
+                stage_ms[stage] = stage_ms.get(stage, 0.0) + ms
+        grades = grades_for(results, item["relevant"])
+        recalls.append(recall_at_k(results, item["relevant"]))
+        rrs.append(reciprocal_rank(grades))
+        ndcgs.append(ndcg_at_k(grades, item["relevant"], top_k))
+        if rrs[-1] == 0:
+            misses.append(item["query"])
+    return {
+        "mode": mode,
+        "ef_search": ef_search,
+        "probes": probes,
+        "recall": round(statistics.mean(recalls), 4),
+        "mrr": round(statistics.mean(rrs), 4),
+        "ndcg": round(statistics.mean(ndcgs), 4),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "stages_ms_avg": {stage: round(ms / len(latencies), 2) for stage, ms in stage_ms.items()},
+        "misses": misses,
+    }
+
+
+def print_report(active: dict, rows: list[dict], top_k: int, count: int):
+    print("config: " + " ".join(f"{k}={v}" for k, v in active.items()))
+    print(f"queries={count} top_k={top_k}\n")
+    print(f"{'mode':<11} {'ef':>4} {'probes':>6} {f'recall@{top_k}':>9} {'MRR':>6} {f'nDCG@{top_k}':>7} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'encode':>7} {'db':>7}")
+    for r in rows:
+        stages = r["stages_ms_avg"]
+        print(f"{r['mode']:<11} {r['ef_search'] or '-':>4} {r['probes'] or '-':>6} {r['recall']:>9.3f} "
+              f"{r['mrr']:>6.3f} {r['ndcg']:>7.3f} {r['p50_ms']:>8} {r['p95_ms']:>8} "
+              f"{stages.get('encode', 0):>7} {stages.get('db', 0):>7}")
+    for r in rows:
+        if r["misses"] and r["ef_search"] is None and r["probes"] is None:
+            print(f"\n{r['mode']} missed: {', '.join(r['misses'])}", end="")
+    print()
+
+
+async def main() -> None:
+    labelled = json.loads(os.environ["EVAL_QUERIES"])
+    queries = labelled["queries"] if isinstance(labelled, dict) else labelled
+    top_k = int(os.environ.get("EVAL_TOP_K", "5"))
+    repeats = max(1, int(os.environ.get("EVAL_REPEATS", "3")))
+    modes = [m for m in os.environ.get("EVAL_MODES", ",".join(MODES)).split(",") if m]
+    unknown = [m for m in modes if m not in MODES]
+    if unknown:
+        raise SystemExit(f"Unknown EVAL_MODES: {unknown}; expected {list(MODES)}")
+
+    await db.open_pool()
+    needs_model = any(MODES[m][0] != "fts" for m in modes)
+    if needs_model:
+        encoder.load_model()
+        encoder.batcher.start()
+    if config.MEMORY_INDEX:
+        async with db.pool.connection() as conn:
+            await memory_index.index.refresh(conn)
+
+    try:
+        # One untimed pass so model warm-up and cold pool connections do not skew the first mode.
+        for item in queries[:3]:
+            for mode in modes:
+                search_mode, fusion = MODES[mode]
+                await run_search(item["query"], search_mode, top_k, fusion)
+        rows = [
+            await evaluate(queries, mode, ef_search, probes, top_k, repeats)
+            for mode, ef_search, probes in variants(modes)
+        ]
+    finally:
+        if needs_model:
+            await encoder.batcher.stop()
+        await db.close_pool()
+        encoder.shutdown()
+
+    active = {key: getattr(config, key) for key in CONFIG_KEYS}
+    print_report(active, rows, top_k, len(queries))
+    print("RESULT " + json.dumps({"config": active, "top_k": top_k, "queries": len(queries), "results": rows},
+                                 ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,56 @@
+#!/usr/bin/env bash
+set -euo pipefail
+
+# Retrieval quality (recall@k, MRR, nDCG@k) and latency per search mode, for one or more configs.
+#
+# Usage: scripts/eval_search.sh ["FTS_WEIGHT=0.3 VECTOR_WEIGHT=0.7" ["HNSW_EF_SEARCH=100" ...]]
+#
+# Each argument is a set of env overrides for search-api settings and is evaluated in a fresh
+# in-container process; without arguments the running config is evaluated.
+# Env: EVAL_QUERIES_FILE (data/eval/search_queries.json), EVAL_TOP_K (5), EVAL_REPEATS (3),
+#      EVAL_MODES (fts,vector,hybrid,hybrid-rrf), EVAL_EF_SEARCH / EVAL_PROBES (sweeps, e.g. 20,40,100),
+#      EVAL_CONTAINER (coskb-search-api).
+# Results are saved to data/eval/results/<timestamp>-<commit>.json.
+
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+PROJECT_ROOT="$(cd "${SCRIPT_DIR}/.." && pwd)"
+cd "${PROJECT_ROOT}"
+
+CONTAINER="${EVAL_CONTAINER:-coskb-search-api}"
+QUERIES_FILE="${EVAL_QUERIES_FILE:-data/eval/search_queries.json}"
+if [ "$#" -eq 0 ]; then
+  set -- ""
+fi
+
+commit="$(git rev-parse --short HEAD 2>/dev/null || echo unknown)"
+mkdir -p data/eval/results
+out="data/eval/results/$(date +%Y%m%d-%H%M%S)-${commit}.json"
+: > "${out}.tmp"
+
+for overrides in "$@"; do
+  env_args=()
+  for kv in ${overrides}; do
+    env_args+=(-e "${kv}")
+  done
+  echo "=== ${overrides:-current config} ==="
+  docker exec -i \
+    -e EVAL_QUERIES="$(cat "${QUERIES_FILE}")" \
+    -e EVAL_TOP_K="${EVAL_TOP_K:-5}" \
+    -e EVAL_REPEATS="${EVAL_REPEATS:-3}" \
+    -e EVAL_MODES="${EVAL_MODES:-fts,vector,hybrid,hybrid-rrf}" \
+    -e EVAL_EF_SEARCH="${EVAL_EF_SEARCH:-}" \
+    -e EVAL_PROBES="${EVAL_PROBES:-}" \
+    ${env_args[@]+"${env_args[@]}"} \
+    "${CONTAINER}" python - < scripts/eval_search.py \
+    | tee /dev/stderr | sed -n 's/^RESULT //p' >> "${out}.tmp"
+  echo
+done
+
+python3 - "${out}.tmp" "${out}" "${commit}" <<'PY'
+import json, sys
+runs = [json.loads(line) for line in open(sys.argv[1], encoding="utf-8") if line.strip()]
+with open(sys.argv[2], "w", encoding="utf-8") as f:
+    json.dump({"label": sys.argv[3], "runs": runs}, f, ensure_ascii=False, indent=2)
+PY
+rm -f "${out}.tmp"
+echo "Saved ${out}"
@@ -0,0 +1,350 @@
+from __future__ import annotations
+
+import json
+import time
+from urllib.parse import urlencode
+
+import pytest
+from test_search_iteration9 import (
+    _run_container_python,
+    _search_api_get,
+    _search_api_get_raw,
+    ensure_search_api_container_running,  # noqa: F401
+)
+
+
+def _search_api_post(path: str, **params: object) -> dict:
+    query = urlencode(params, doseq=True)
+    url = f"http://localhost:8000{path}" + (f"?{query}" if query else "")
+    script = f"""
+import urllib.request
+req = urllib.request.Request({url!r}, data=b"", method="POST")
+with urllib.request.urlopen(req, timeout=300) as r:
+    print(r.read().decode("utf-8", errors="replace"))
+"""
+    return json.loads(_run_container_python(script))
+
+
+def _search_api_post_json(path: str, body: dict) -> tuple[int, dict]:
+    script = f"""
+import json, urllib.error, urllib.request
+req = urllib.request.Request(
+    {"http://localhost:8000" + path!r},
+    data=json.dumps({body!r}).encode("utf-8"),
+    headers={{"Content-Type": "application/json"}},
+    method="POST",
+)
+try:
+    with urllib.request.urlopen(req, timeout=300) as r:
+        print(json.dumps({{"status": r.status, "payload": json.loads(r.read())}}))
+except urllib.error.HTTPError as e:
+    print(json.dumps({{"status": e.code, "payload": json.loads(e.read() or b"{{}}")}}))
+"""
+    response = json.loads(_run_container_python(script))
+    return response["status"], response["payload"]
+
+
+def test_pool_stats_contract() -> None:
+    payload = _search_api_get("/pool-stats")
+    assert payload.get("open") is True
+    assert isinstance(payload.get("max_size"), int)
+    assert 0 <= payload["size"] <= payload["max_size"]
+    assert 0.0 <= float(payload["saturation"]) <= 1.0
+    assert float(payload["wait_ms_avg"]) >= 0.0
+
+
+def test_pool_reuses_connections_across_requests() -> None:
+    before = _search_api_get("/pool-stats")
+    for _ in range(5):
+        _search_api_get("/search", q="vpn", mode="fts", top_k=1)
+    after = _search_api_get("/pool-stats")
+    assert after["requests_total"] >= before["requests_total"] + 5
+    assert after["size"] <= after["max_size"]
+
+
+def test_encoder_stats_counts_batched_queries() -> None:
+    before = _search_api_get("/encoder-stats")
+    _search_api_get("/search", q="vpn", mode="vector", top_k=1)
+    after = _search_api_get("/encoder-stats")
+    assert after["queries"] >= before["queries"] + 1
+    assert 1 <= after["largest_batch"] <= after["max_batch_size"]
+    assert float(after["queue_delay_ms_avg"]) >= 0.0
+
+
+def test_repeated_vector_query_hits_embedding_cache() -> None:
+    _search_api_get("/search", q="outlook", mode="vector", top_k=1)
+    before = _search_api_get("/encoder-stats")["query_cache"]
+    # Another top_k misses the result cache; extra whitespace still hits the embedding cache.
+    _search_api_get("/search", q="  outlook ", mode="vector", top_k=2)
+    after = _search_api_get("/encoder-stats")["query_cache"]
+    assert after["hits"] == before["hits"] + 1
+    assert after["size"] <= after["max_size"]
+
+
+def test_search_log_is_written_in_background() -> None:
+    before = _search_api_get("/search-log-stats")
+    _search_api_get("/search", q="токен", mode="fts", top_k=1)
+    deadline = time.time() + before["flush_ms"] / 1000 + 5
+    after = _search_api_get("/search-log-stats")
+    while after["written"] <= before["written"] and time.time() < deadline:
+        time.sleep(0.5)
+        after = _search_api_get("/search-log-stats")
+    assert after["written"] >= before["written"] + 1
+    assert after["failed"] == before["failed"]
+
+
+def test_search_stats_window_from_daily_aggregates() -> None:
+    _search_api_get("/search", q="сакура", mode="fts", top_k=1)
+    flush_ms = _search_api_get("/search-log-stats")["flush_ms"]
+    time.sleep(flush_ms / 1000 + 1)
+    today = _search_api_get("/search-stats", days=1, top_limit=50)
+    total = _search_api_get("/search-stats")
+    assert today["days"] == 1
+    assert 1 <= today["totals"]["searches"] <= total["totals"]["searches"]
+    assert any(r["query"] == "сакура" and r["mode"] == "fts" for r in today["top_queries"])
+    assert today["totals"]["latency_ms_avg"] is None or today["totals"]["latency_ms_avg"] >= 0
+
+
+def test_repeated_search_is_served_from_result_cache() -> None:
+    first = _search_api_get("/search", q="сфера", mode="hybrid", top_k=3)
+    before = _search_api_get("/cache-stats")
+    second = _search_api_get("/search", q="сфера", mode="hybrid", top_k=3)
+    after = _search_api_get("/cache-stats")
+    assert second["results"] == first["results"]
+    assert after["modes"]["hybrid"]["hits"] == before["modes"]["hybrid"]["hits"] + 1
+    assert after["generation"] == before["generation"]
+
+
+@pytest.mark.parametrize("fusion", ("weighted", "rrf"))
+def test_hybrid_fusion_methods_return_sorted_results(fusion: str) -> None:
+    payload = _search_api_get("/search", q="vpn", mode="hybrid", top_k=5, fusion=fusion)
+    results = payload["results"]
+    assert results, f"Expected results for fusion={fusion}"
+    scores = [float(item["score"]) for item in results]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_unknown_fusion_returns_422() -> None:
+    status_code, _ = _search_api_get_raw("/search", q="vpn", mode="hybrid", fusion="max")
+    assert status_code == 422
+
+
+def test_unknown_mode_returns_422() -> None:
+    status_code, _ = _search_api_get_raw("/search", q="vpn", mode="semantic")
+    assert status_code == 422
+    modes = _search_api_get("/cache-stats")["modes"]
+    assert "semantic" not in modes
+
+
+def test_vector_index_status_contract() -> None:
+    payload = _search_api_get("/vector-index")
+    assert payload.get("configured") in {"hnsw", "ivfflat", "none"}
+    assert payload.get("storage") in {"vector", "halfvec", "binary"}
+    memory = payload.get("memory")
+    if memory is not None:
+        assert memory["loaded"] is True
+        assert memory["rows"] == _search_api_get("/stats")["indexed_pages"]
+    for index in payload.get("indexes", []):
+        assert index["method"] in {"hnsw", "ivfflat"}
+        assert int(index["size_bytes"]) > 0
+
+
+@pytest.mark.parametrize("mode", ("vector", "hybrid"))
+def test_search_accepts_ef_search(mode: str) -> None:
+    payload = _search_api_get("/search", q="vpn", mode=mode, top_k=5, ef_search=100)
+    assert len(payload["results"]) <= 5
+
+
+def test_similar_accepts_ef_search() -> None:
+    seed = _search_api_get("/search", q="vpn", mode="hybrid", top_k=1)["results"][0]["page_id"]
+    payload = _search_api_get("/similar", page_id=seed, top_k=3, ef_search=64)
+    assert seed not in {item["page_id"] for item in payload["similar"]}
+
+
+def test_duplicates_groups_cover_pairs() -> None:
+    payload = _search_api_get("/duplicates", threshold=0.9, groups="true")
+    grouped = {page_id for group in payload["groups"] for page_id in group}
+    for pair in payload["duplicates"]:
+        assert pair["page_id_1"] in grouped
+        assert pair["page_id_2"] in grouped
+    for group in payload["groups"]:
+        assert len(group) >= 2
+
+
+def test_repeated_index_run_skips_unchanged_pages() -> None:
+    _search_api_post("/index", wait="true")
+    job = _search_api_post("/index", wait="true")
+    assert job["status"] == "done"
+    summary = job["summary"]
+    assert summary["added"] == 0
+    assert summary["updated"] == 0
+    assert summary["skipped"] >= 1
+    assert summary["deleted"] == 0
+
+
+def test_index_job_progress_endpoint() -> None:
+    job = _search_api_post("/index")
+    assert job["status"] in {"queued", "running", "done"}
+    status = _search_api_get(f"/index/{job['job_id']}")
+    assert status["job_id"] == job["job_id"]
+    assert status["written"] <= status["total"]
+    assert float(status["pages_per_sec"]) >= 0.0
+
+
+def test_unknown_index_job_returns_404() -> None:
+    status_code, _ = _search_api_get_raw("/index/does-not-exist")
+    assert status_code == 404
+
+
+def test_health_live_and_ready() -> None:
+    live = _search_api_get("/health/live")
+    assert live["status"] == "alive"
+    status_code, ready = _search_api_get_raw("/health/ready")
+    assert status_code == 200
+    assert ready["ready"] is True
+    assert all(ready["capabilities"].values())
+    assert {"db_wait", "init_db", "db_pool", "model_load"} <= set(ready["phases"])
+
+
+def test_search_debug_returns_stage_timings() -> None:
+    payload = _search_api_get("/search", q="vpn", mode="hybrid", top_k=3, debug="true", fusion="rrf")
+    debug = payload["debug"]
+    assert float(debug["total_ms"]) > 0
+    assert "cache" in debug["stages_ms"]
+    if not debug["cache_hit"]:
+        assert {"expand", "encode", "db", "rank"} <= set(debug["stages_ms"])
+
+
+def test_metrics_endpoint_exports_prometheus_text() -> None:
+    _search_api_get("/search", q="outlook", mode="fts", top_k=1)
+    text = _run_container_python(
+        "import urllib.request\n"
+        "with urllib.request.urlopen('http://localhost:8000/metrics', timeout=20) as r:\n"
+        "    print(r.read().decode())\n"
+    )
+    assert 'searchapi_search_stage_seconds_bucket{' in text
+    assert 'searchapi_search_seconds_count{mode="fts"}' in text
+    assert "searchapi_db_pool_size" in text
+    assert 'searchapi_cache_lookups_total{cache="query_embedding",result="hit"}' in text
+
+
+def test_search_batch_returns_items_in_order() -> None:
+    queries = [
+        {"q": "vpn", "mode": "fts", "top_k": 3},
+        {"q": "outlook", "mode": "vector", "top_k": 2},
+        {"q": "токен", "mode": "hybrid", "top_k": 3},
+    ]
+    status, payload = _search_api_post_json("/search/batch", {"queries": queries})
+    assert status == 200, payload
+    items = payload["items"]
+    assert [(i["query"], i["mode"]) for i in items] == [(q["q"], q["mode"]) for q in queries]
+    for item, query in zip(items, queries):
+        assert "error" not in item, item
+        assert len(item["results"]) <= query["top_k"]
+    single = _search_api_get("/search", q="vpn", mode="fts", top_k=3)
+    assert [r["page_id"] for r in items[0]["results"]] == [r["page_id"] for r in single["results"]]
+
+
+def test_search_batch_reports_item_errors() -> None:
+    status, payload = _search_api_post_json(
+        "/search/batch",
+        {"queries": [{"q": "vpn", "mode": "unknown"}, {"q": "сфера", "mode": "fts"}]},
+    )
+    assert status == 200, payload
+    bad, good = payload["items"]
+    assert "error" in bad and "results" not in bad
+    assert isinstance(good["results"], list)
+
+
+def test_search_batch_rejects_empty_list() -> None:
+    status, _ = _search_api_post_json("/search/batch", {"queries": []})
+    assert status == 422
+
+
+def test_similar_served_from_precomputed_neighbours() -> None:
+    _search_api_post("/index", wait="true")
+    seed = _search_api_get("/search", q="vpn", mode="hybrid", top_k=1)["results"][0]["page_id"]
+    payload = _search_api_get("/similar", page_id=seed, top_k=5)
+    assert payload["source"] == "precomputed"
+    scores = [item["score"] for item in payload["similar"]]
+    assert scores == sorted(scores, reverse=True)
+    assert seed not in {item["page_id"] for item in payload["similar"]}
+
+
+def test_similar_precomputed_after_full_reindex() -> None:
+    _search_api_post("/index", full="true", wait="true")
+    seed = _search_api_get("/search", q="vpn", mode="hybrid", top_k=1)["results"][0]["page_id"]
+    payload = _search_api_get("/similar", page_id=seed, top_k=5)
+    assert payload["source"] == "precomputed"
+
+
+@pytest.mark.parametrize("query", ["Sfera?", "sfera, задачи"])
+def test_alias_expansion_ignores_punctuation(query: str) -> None:
+    payload = _search_api_get("/search", q=query, mode="fts", top_k=5)
+    titles = " ".join(item["title"].lower() for item in payload["results"])
+    assert "сфера" in titles, payload
+
+
+def test_query_expansion_is_memoized() -> None:
+    _search_api_get("/search", q="rutoken", mode="fts", top_k=1)
+    before = _search_api_get("/cache-stats")["query_expansion"]
+    _search_api_get("/search", q="rutoken", mode="fts", top_k=2)
+    after = _search_api_get("/cache-stats")["query_expansion"]
+    assert after["entries"] > 0
+    assert after["cache_hits"] >= before["cache_hits"] + 1
+
+
+def test_split_text_windows_overlap() -> None:
+    script = """
+import json, math
+from transformers import AutoTokenizer
+from app import chunks, encoder
+from app.config import CHUNK_OVERLAP, CHUNK_TOKENS, MODEL_NAME
+
+class Model:
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+
+encoder.model = Model()
+text = " ".join(f"слово{i}" for i in range(CHUNK_TOKENS * 3))
+tokens = len(Model.tokenizer(text, add_special_tokens=False)["input_ids"])
+step = max(1, CHUNK_TOKENS - CHUNK_OVERLAP)
+print(json.dumps({
+    "parts": chunks.split_text(text),
+    "short": chunks.split_text("  vpn ext  "),
+    "empty": chunks.split_text("   "),
+    "expected": 1 + math.ceil(max(0, tokens - CHUNK_TOKENS) / step),
+    "first": text.split()[0],
+    "last": text.split()[-1],
+}, ensure_ascii=False))
+"""
+    payload = json.loads(_run_container_python(script))
+    parts = payload["parts"]
+    assert len(parts) == payload["expected"] > 1
+    assert parts[0].startswith(payload["first"])
+    assert parts[-1].endswith(payload["last"])
+    for prev, cur in zip(parts, parts[1:]):
+        # Consecutive windows share CHUNK_OVERLAP tokens: the next one starts inside the previous.
+        assert cur.split()[1] in prev.split()
+    assert payload["short"] == ["vpn ext"]
+    assert payload["empty"] == []
+
+
+def test_chunk_search_aggregates_to_unique_pages() -> None:
+    enabled = _run_container_python("import os; print(os.environ.get('CHUNKS_ENABLED', '0'))")
+    if enabled != "1":
+        pytest.skip("CHUNKS_ENABLED is off in the search-api container")
+    _search_api_post("/index", wait="true")
+    count = _run_container_python("""
+from app.db import get_raw_connection
+with get_raw_connection() as conn:
+    print(conn.execute("SELECT COUNT(*) FROM ai.chunks").fetchone()[0])
+""")
+    assert int(count) > 0
+    for aggregate in ("max", "sum"):
+        payload = _search_api_get("/search", q="vpn", mode="hybrid", top_k=5, aggregate=aggregate)
+        page_ids = [item["page_id"] for item in payload["results"]]
+        scores = [item["score"] for item in payload["results"]]
+        assert page_ids, payload
+        assert len(page_ids) == len(set(page_ids))
+        assert scores == sorted(scores, reverse=True)
+
@@ -1,42 +1,173 @@
+import functools
 import json
 import logging
+import os
+import re
+import threading
+import time
 from pathlib import Path
+from typing import NamedTuple
+
+from app.config import ALIAS_CACHE_SIZE, ALIASES_RELOAD_SECONDS
 
 logger = logging.getLogger("search-api")
 
-_ALIASES_PATH = Path(__file__).resolve().parent.parent / "aliases.json"
+_ALIASES_PATH = Path(__file__).resolve().parent.parent / "aliases" / "aliases.json"
+
+# A word, with inner - . @ / kept (wi-fi, sfera.inno.local, spp3@vtb.ru) so
+# hosts and emails stay single tokens, as in the Postgres text search parser.
+TOKEN_RE = re.compile(r"\w+(?:[-.@/]\w+)*")
+
+
+def tokenize(text: str) -> list[re.Match]:
+    return list(TOKEN_RE.finditer(text))
+
+
+def _tsquery_term(phrase: str) -> str:
+    """to_tsquery text for one phrase; tokens are quoted, words of a phrase are ANDed."""
+    words = [f"'{m.group().lower()}'" for m in tokenize(phrase)]
+    return words[0] if len(words) == 1 else "(" + " & ".join(words) + ")"
+
+
+class Expansion(NamedTuple):
+    original: str
+    # Query with each alias phrase replaced by its synonyms (for the vector side).
+    rewritten: str | None
+    # Query text outside alias phrases, for plainto_tsquery.
+    fts_text: str
+    # to_tsquery text with one (phrase | synonym | ...) group per alias phrase.
+    alias_tsquery: str | None
+
+
+class AliasEngine:
+    """Query expansion over aliases.json.
+
+    Keys are matched as token sequences with a trie, longest phrase first, so
+    multi-word aliases work and punctuation does not hide a match. Every
+    synonym of a match is used. Expansions are memoized per query; the file
+    is re-read when its mtime changes (checked at most every reload_seconds),
+    and an invalid file keeps the previous aliases.
+    """
+
+    def __init__(self, path: Path, cache_size: int, reload_seconds: float):
+        self.path = path
+        self.cache_size = cache_size
+        self.reload_seconds = reload_seconds
+        self.aliases: dict[str, list[str]] = {}
+        self.trie: dict = {}
+        self.mtime: float | None = None
+        self.checked_at = 0.0
+        self.reloads = 0
+        # Called after a successful reload, e.g. to drop cached search results.
+        self.on_reload = None
+        self._lock = threading.Lock()
+        self._expand = functools.lru_cache(maxsize=cache_size)(self._expand_uncached)
+        self.load()
+
+    def load(self):
+        try:
+            # Remembered even if parsing fails, so a broken file is reported once.
+            self.mtime = os.stat(self.path).st_mtime
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as exc:
+            if not self.reloads:
+                logger.warning("Failed to load aliases: %s. Query expansion disabled.", exc)
+            else:
+                logger.warning("Failed to reload aliases: %s. Keeping previous entries.", exc)
+            return
+        trie: dict = {}
+        for key, synonyms in data.items():
+            if isinstance(synonyms, str):
+                synonyms = [synonyms]
+            node = trie
+            for m in tokenize(key):
+                node = node.setdefault(m.group().lower(), {})
+            if node is not trie and synonyms:
+                node[None] = synonyms
+        self.aliases, self.trie = data, trie
+        self._expand = functools.lru_cache(maxsize=self.cache_size)(self._expand_uncached)
+        self.reloads += 1
+        logger.info("Loaded %d alias entries from %s", len(data), self.path.name)
+        if self.reloads > 1 and self.on_reload is not None:
+            self.on_reload()
+
+    def maybe_reload(self):
+        now = time.monotonic()
+        if self.reload_seconds <= 0 or now - self.checked_at < self.reload_seconds:
+            return
+        with self._lock:
+            if now - self.checked_at < self.reload_seconds:
+                return
+            self.checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError:
+                return
+            if mtime != self.mtime:
+                self.load()
+
+    def expand(self, q: str) -> Expansion:
+        self.maybe_reload()
+        return self._expand(q)
+
+    def matches(self, tokens: list[re.Match]) -> list[tuple[int, int, list[str]]]:
+        """(first token, end token, synonyms) of the longest alias phrase at each position."""
+        found = []
+        i = 0
+        while i < len(tokens):
+            node, end, synonyms = self.trie, None, None
+            for j in range(i, len(tokens)):
+                node = node.get(tokens[j].group().lower())
+                if node is None:
+                    break
+                if None in node:
+                    end, synonyms = j + 1, node[None]
+            if end is None:
+                i += 1
+                continue
+            found.append((i, end, synonyms))
+            i = end
+        return found
+
+    def _expand_uncached(self, q: str) -> Expansion:
+        tokens = tokenize(q)
+        found = self.matches(tokens) if self.trie else []
+        if not found:
+            return Expansion(q, None, q, None)
 
+        rewritten, rest, groups = [], [], []
+        pos = 0
+        for first, end, synonyms in found:
+            start, stop = tokens[first].start(), tokens[end - 1].end()
+            rewritten.append(q[pos:start] + " ".join(synonyms))
+            rest.append(q[pos:start])
+            phrase = q[start:stop]
+            terms = list(dict.fromkeys(_tsquery_term(p) for p in (phrase, *synonyms) if tokenize(p)))
+            groups.append("(" + " | ".join(terms) + ")")
+            pos = stop
+        rewritten.append(q[pos:])
+        rest.append(q[pos:])
+        return Expansion(q, "".join(rewritten), " ".join(rest), " & ".join(groups))
 
-def _load_aliases() -> dict[str, list[str]]:
-    try:
-        with open(_ALIASES_PATH, encoding="utf-8") as f:
-            data = json.load(f)
-        logger.info("Loaded %d alias entries from %s", len(data), _ALIASES_PATH.name)
-        return data
-    except (FileNotFoundError, json.JSONDecodeError) as exc:
-        logger.warning("Failed to load aliases: %s. Query expansion disabled.", exc)
-        return {}
+    def stats(self) -> dict:
+        info = self._expand.cache_info()
+        return {
+            "entries": len(self.aliases),
+            "reloads": self.reloads,
+            "cache_size": info.currsize,
+            "cache_hits": info.hits,
+            "cache_misses": info.misses,
+        }
 
 
-ALIASES: dict[str, list[str]] = _load_aliases()
+engine = AliasEngine(_ALIASES_PATH, ALIAS_CACHE_SIZE, ALIASES_RELOAD_SECONDS)
 
 
-def expand_query(q: str) -> tuple[str, str | None]:
-    """Replace alias matches with first synonym.
+def expand_query(q: str) -> Expansion:
+    """Expand alias matches with their synonyms.
 
-    Returns (original, rewritten) or (original, None) if no match.
+    Returns an Expansion whose first two fields are (original, rewritten),
+    rewritten being None when nothing matched.
     """
-    if not ALIASES:
-        return q, None
-
-    words = q.split()
-    rewritten = []
-    changed = False
-    for word in words:
-        key = word.lower()
-        if key in ALIASES:
-            rewritten.append(ALIASES[key][0])
-            changed = True
-        else:
-            rewritten.append(word)
-    return q, " ".join(rewritten) if changed else None
+    return engine.expand(q)
@@ -0,0 +1,103 @@
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+
+
+class TTLCache:
+    """Bounded LRU mapping whose entries expire ttl seconds after insertion.
+
+    Not thread-safe: used only from the event loop.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, object]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable):
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: object):
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+class ResultCache:
+    """Search responses keyed by (generation, query, mode, top_k, *options).
+
+    bump() starts a new index generation: older entries become unreachable,
+    including ones stored by requests that started before the bump.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize, ttl)
+        self.generation = 0
+        self.mode_hits: dict[str, int] = {}
+        self.mode_misses: dict[str, int] = {}
+
+    def key(self, q: str, mode: str, top_k: int, *options) -> tuple:
+        # Case is kept: vector and hybrid results depend on it (the model is cased).
+        return (self.generation, " ".join(q.split()), mode, top_k, *options)
+
+    def get(self, key: tuple):
+        value = self._cache.get(key)
+        counter = self.mode_misses if value is None else self.mode_hits
+        counter[key[2]] = counter.get(key[2], 0) + 1
+        return value
+
+    def put(self, key: tuple, value: object):
+        if key[0] == self.generation:
+            self._cache.put(key, value)
+
+    def bump(self):
+        self.generation += 1
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        modes = {}
+        for mode in sorted(set(self.mode_hits) | set(self.mode_misses)):
+            hits = self.mode_hits.get(mode, 0)
+            misses = self.mode_misses.get(mode, 0)
+            modes[mode] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits / (hits + misses), 4),
+            }
+        return {"generation": self.generation, **self._cache.stats(), "modes": modes}
@@ -0,0 +1,117 @@
+import psycopg
+
+from app import encoder, vector_index
+from app.config import CHUNK_TOKENS, CHUNK_OVERLAP, CHUNK_CANDIDATES, EMBEDDING_DIM, FTS_LANGUAGE
+
+STAGE_COLUMNS = ("page_id", "chunk_no", "content", "embedding", "fts_text")
+STAGE_TYPES = ("int4", "int4", "text", "vector", "text")
+
+
+def split_text(text: str) -> list[str]:
+    """Split text into windows of CHUNK_TOKENS model tokens overlapping by CHUNK_OVERLAP.
+
+    Windows are cut on token boundaries using the tokenizer's character
+    offsets, so every chunk fits the model's context together with the title.
+    """
+    if not text.strip():
+        return []
+    offsets = encoder.model.tokenizer(
+        text, add_special_tokens=False, return_offsets_mapping=True, verbose=False,
+    )["offset_mapping"]
+    if len(offsets) <= CHUNK_TOKENS:
+        return [text.strip()]
+    step = max(1, CHUNK_TOKENS - CHUNK_OVERLAP)
+    parts = []
+    for start in range(0, len(offsets), step):
+        window = offsets[start:start + CHUNK_TOKENS]
+        parts.append(text[window[0][0]:window[-1][1]].strip())
+        if start + CHUNK_TOKENS >= len(offsets):
+            break
+    return parts
+
+
+def page_chunks(content: str | None) -> list[str]:
+    return split_text(content or "") or [""]
+
+
+def chunk_passage(title: str, chunk: str) -> str:
+    return f"{title}\n{chunk}"
+
+
+async def replace_chunks(cur: psycopg.AsyncCursor, page_ids: list[int], rows: list[tuple]):
+    """Replace all chunks of page_ids with rows (page_id, chunk_no, content, embedding, fts_text)."""
+    await cur.execute("DELETE FROM ai.chunks WHERE page_id = ANY(%s)", (page_ids,))
+    await cur.execute(f"""
+        CREATE TEMP TABLE IF NOT EXISTS chunks_stage (
+            page_id INTEGER,
+            chunk_no INTEGER,
+            content TEXT,
+            embedding vector({EMBEDDING_DIM}),
+            fts_text TEXT
+        ) ON COMMIT DROP
+    """)
+    async with cur.copy(
+        f"COPY chunks_stage ({', '.join(STAGE_COLUMNS)}) FROM STDIN (FORMAT BINARY)"
+    ) as copy:
+        copy.set_types(STAGE_TYPES)
+        for row in rows:
+            await copy.write_row(row)
+    await cur.execute("""
+        INSERT INTO ai.chunks (page_id, chunk_no, content, embedding, fts)
+        SELECT page_id, chunk_no, content, embedding, to_tsvector(%s::regconfig, fts_text)
+        FROM chunks_stage
+    """, (FTS_LANGUAGE,))
+    await cur.execute("TRUNCATE chunks_stage")
+
+
+async def fetch_candidates(cur: psycopg.AsyncCursor, mode: str, tsq: str, params: dict,
+                           ef_search: int | None, probes: int | None) -> list[dict]:
+    """Best-matching chunks with their page metadata, as fusion candidates."""
+    params = {**params, "n": max(CHUNK_CANDIDATES, params["top_k"])}
+
+    if mode == "fts":
+        await cur.execute(f"""
+            SELECT c.page_id, e.title, e.path, c.content,
+                   0.0, ts_rank(c.fts, {tsq}), true
+            FROM ai.chunks c
+            JOIN ai.embeddings e ON e.page_id = c.page_id
+            WHERE c.fts @@ {tsq}
+            ORDER BY ts_rank(c.fts, {tsq}) DESC
+            LIMIT %(n)s
+        """, params)
+    elif mode == "vector":
+        await vector_index.apply_search_params(cur, params["n"], ef_search, probes)
+        await cur.execute(f"""
+            WITH vec AS ({vector_index.nearest_sql("ai.chunks", "id")})
+            SELECT c.page_id, e.title, e.path, c.content, vec.vec_score, 0.0, false
+            FROM vec
+            JOIN ai.chunks c ON c.id = vec.id
+            JOIN ai.embeddings e ON e.page_id = c.page_id
+        """, params)
+    else:
+        await vector_index.apply_search_params(cur, params["n"], ef_search, probes)
+        await cur.execute(f"""
+            WITH vec AS ({vector_index.nearest_sql("ai.chunks", "id")}),
+            fts AS (
+                SELECT id
+                FROM ai.chunks
+                WHERE fts @@ {tsq}
+                ORDER BY ts_rank(fts, {tsq}) DESC
+                LIMIT %(n)s
+            )
+            SELECT c.page_id, e.title, e.path, c.content,
+                   1 - (c.embedding <=> %(vec)s::vector),
+                   COALESCE(ts_rank(c.fts, {tsq}), 0),
+                   COALESCE(c.fts @@ {tsq}, false)
+            FROM ai.chunks c
+            JOIN ai.embeddings e ON e.page_id = c.page_id
+            WHERE c.id IN (SELECT id FROM vec UNION SELECT id FROM fts)
+        """, params)
+
+    return [
+        {
+            "page_id": r[0], "title": r[1], "path": r[2], "preview": r[3],
+            "vec_score": float(r[4]), "fts_score": float(r[5]), "fts_match": r[6],
+        }
+        for r in await cur.fetchall()
+    ]
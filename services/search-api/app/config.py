@@ -7,6 +7,9 @@ DB_PASS = os.environ.get("DB_PASS", "")
 DB_NAME = os.environ.get("DB_NAME", "coskb")
 
 MODEL_NAME = "intfloat/multilingual-e5-small"
+MODEL_BACKEND = os.environ.get("MODEL_BACKEND", "torch")
+ONNX_QUANT_CONFIG = os.environ.get("ONNX_QUANT_CONFIG", "avx2")
+ONNX_MODEL_DIR = os.environ.get("ONNX_MODEL_DIR", os.path.join(os.environ.get("HF_HOME", "/models"), "onnx"))
 EMBEDDING_DIM = 384
 TOP_K = 5
 SNIPPET_LENGTH = 300
@@ -14,7 +17,60 @@ SNIPPET_LENGTH = 300
 FTS_WEIGHT = float(os.environ.get("FTS_WEIGHT", "0.4"))
 VECTOR_WEIGHT = float(os.environ.get("VECTOR_WEIGHT", "0.6"))
 FTS_LANGUAGE = os.environ.get("FTS_LANGUAGE", "russian")
+ALIAS_CACHE_SIZE = int(os.environ.get("ALIAS_CACHE_SIZE", "4096"))
+ALIASES_RELOAD_SECONDS = float(os.environ.get("ALIASES_RELOAD_SECONDS", "5"))
 
 MIN_SCORE_HYBRID = float(os.environ.get("MIN_SCORE_HYBRID", "0.52"))
 MIN_SCORE_VECTOR = float(os.environ.get("MIN_SCORE_VECTOR", "0.55"))
 MIN_SCORE_FTS = float(os.environ.get("MIN_SCORE_FTS", "0.001"))
+
+DB_POOL_MIN_SIZE = int(os.environ.get("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.environ.get("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "10"))
+DB_POOL_MAX_IDLE = float(os.environ.get("DB_POOL_MAX_IDLE", "300"))
+DB_POOL_MAX_LIFETIME = float(os.environ.get("DB_POOL_MAX_LIFETIME", "3600"))
+
+ENCODE_WORKERS = int(os.environ.get("ENCODE_WORKERS", "2"))
+ENCODE_BATCH_MAX_SIZE = int(os.environ.get("ENCODE_BATCH_MAX_SIZE", "16"))
+ENCODE_BATCH_MAX_WAIT_MS = float(os.environ.get("ENCODE_BATCH_MAX_WAIT_MS", "5"))
+
+QUERY_CACHE_SIZE = int(os.environ.get("QUERY_CACHE_SIZE", "1024"))
+QUERY_CACHE_TTL = float(os.environ.get("QUERY_CACHE_TTL", "3600"))
+QUERY_CACHE_WARMUP = int(os.environ.get("QUERY_CACHE_WARMUP", "50"))
+
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", "2048"))
+RESULT_CACHE_TTL = float(os.environ.get("RESULT_CACHE_TTL", "600"))
+
+HYBRID_CANDIDATES = int(os.environ.get("HYBRID_CANDIDATES", "50"))
+HYBRID_FUSION = os.environ.get("HYBRID_FUSION", "weighted")
+RRF_K = int(os.environ.get("RRF_K", "60"))
+BATCH_SEARCH_MAX_ITEMS = int(os.environ.get("BATCH_SEARCH_MAX_ITEMS", "50"))
+
+VECTOR_INDEX = os.environ.get("VECTOR_INDEX", "hnsw")
+HNSW_M = int(os.environ.get("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.environ.get("HNSW_EF_CONSTRUCTION", "64"))
+HNSW_EF_SEARCH = int(os.environ.get("HNSW_EF_SEARCH", "40"))
+IVFFLAT_LISTS = int(os.environ.get("IVFFLAT_LISTS", "100"))
+IVFFLAT_PROBES = int(os.environ.get("IVFFLAT_PROBES", "1"))
+VECTOR_STORAGE = os.environ.get("VECTOR_STORAGE", "vector")
+RESCORE_CANDIDATES = int(os.environ.get("RESCORE_CANDIDATES", "100"))
+MEMORY_INDEX = os.environ.get("MEMORY_INDEX", "0") == "1"
+SIMILAR_NEIGHBORS = int(os.environ.get("SIMILAR_NEIGHBORS", "20"))
+
+SEARCH_LOG_QUEUE_SIZE = int(os.environ.get("SEARCH_LOG_QUEUE_SIZE", "10000"))
+SEARCH_LOG_BATCH_SIZE = int(os.environ.get("SEARCH_LOG_BATCH_SIZE", "200"))
+SEARCH_LOG_FLUSH_MS = float(os.environ.get("SEARCH_LOG_FLUSH_MS", "1000"))
+SEARCH_LOG_RETENTION_DAYS = int(os.environ.get("SEARCH_LOG_RETENTION_DAYS", "90"))
+
+DUPLICATES_BLOCK_SIZE = int(os.environ.get("DUPLICATES_BLOCK_SIZE", "256"))
+
+INDEX_WRITE_BATCH_SIZE = int(os.environ.get("INDEX_WRITE_BATCH_SIZE", "500"))
+INDEX_CHUNK_SIZE = int(os.environ.get("INDEX_CHUNK_SIZE", "64"))
+INDEX_ENCODE_PROCESSES = int(os.environ.get("INDEX_ENCODE_PROCESSES", "0"))
+INDEX_TORCH_THREADS = int(os.environ.get("INDEX_TORCH_THREADS", "1"))
+
+CHUNKS_ENABLED = os.environ.get("CHUNKS_ENABLED", "0") == "1"
+CHUNK_TOKENS = int(os.environ.get("CHUNK_TOKENS", "256"))
+CHUNK_OVERLAP = int(os.environ.get("CHUNK_OVERLAP", "32"))
+CHUNK_AGGREGATE = os.environ.get("CHUNK_AGGREGATE", "max")
+CHUNK_CANDIDATES = int(os.environ.get("CHUNK_CANDIDATES", "100"))
@@ -0,0 +1,97 @@
+import logging
+from contextlib import asynccontextmanager
+
+import psycopg
+from pgvector.psycopg import register_vector_async
+from psycopg_pool import AsyncConnectionPool
+
+from app.config import (
+    DB_HOST, DB_PORT, DB_USER, DB_PASS, DB_NAME,
+    DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT,
+    DB_POOL_MAX_IDLE, DB_POOL_MAX_LIFETIME,
+)
+
+logger = logging.getLogger("search-api")
+
+CONNINFO = psycopg.conninfo.make_conninfo(
+    host=DB_HOST,
+    port=DB_PORT,
+    user=DB_USER,
+    password=DB_PASS,
+    dbname=DB_NAME,
+)
+
+pool: AsyncConnectionPool | None = None
+
+
+def get_raw_connection() -> psycopg.Connection:
+    return psycopg.connect(CONNINFO)
+
+
+async def _configure(conn: psycopg.AsyncConnection):
+    await register_vector_async(conn)
+    await conn.commit()
+
+
+async def open_pool() -> AsyncConnectionPool:
+    """Create the shared pool; vector types are registered once per physical connection."""
+    global pool
+    pool = AsyncConnectionPool(
+        CONNINFO,
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=DB_POOL_MAX_SIZE,
+        timeout=DB_POOL_TIMEOUT,
+        max_idle=DB_POOL_MAX_IDLE,
+        max_lifetime=DB_POOL_MAX_LIFETIME,
+        check=AsyncConnectionPool.check_connection,
+        configure=_configure,
+        name="search-api",
+        open=False,
+    )
+    await pool.open(wait=True)
+    logger.info("DB pool opened (min=%d, max=%d)", DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE)
+    return pool
+
+
+@asynccontextmanager
+async def connection(conn: psycopg.AsyncConnection | None = None):
+    """conn itself when given, otherwise a pool connection for the duration of the block."""
+    if conn is not None:
+        yield conn
+        return
+    async with pool.connection() as pooled:
+        yield pooled
+
+
+async def close_pool():
+    global pool
+    if pool is not None:
+        await pool.close()
+        pool = None
+
+
+def pool_stats() -> dict:
+    if pool is None:
+        return {"open": False}
+    s = pool.get_stats()
+    size = s.get("pool_size", 0)
+    available = s.get("pool_available", 0)
+    requests_num = s.get("requests_num", 0)
+    wait_ms = s.get("requests_wait_ms", 0)
+    return {
+        "open": True,
+        "min_size": s.get("pool_min", DB_POOL_MIN_SIZE),
+        "max_size": s.get("pool_max", DB_POOL_MAX_SIZE),
+        "size": size,
+        "available": available,
+        "in_use": size - available,
+        "saturation": round((size - available) / DB_POOL_MAX_SIZE, 4),
+        "requests_waiting": s.get("requests_waiting", 0),
+        "requests_total": requests_num,
+        "requests_queued": s.get("requests_queued", 0),
+        "requests_timeouts": s.get("requests_errors", 0),
+        "wait_ms_total": wait_ms,
+        "wait_ms_avg": round(wait_ms / requests_num, 3) if requests_num else 0.0,
+        "connections_opened": s.get("connections_num", 0),
+        "connections_lost": s.get("connections_lost", 0),
+    }
@@ -0,0 +1,45 @@
+import numpy as np
+
+from app.config import DUPLICATES_BLOCK_SIZE
+
+
+def iter_pair_blocks(ids: np.ndarray, matrix: np.ndarray, threshold: float,
+                     block_size: int = DUPLICATES_BLOCK_SIZE):
+    """Yield (rows, cols, scores) arrays with row < col and score >= threshold.
+
+    matrix rows are L2-normalized embeddings, so a dot product is the cosine
+    similarity. Each block compares block_size rows against the rows after
+    them only, which keeps memory at block_size * n floats and visits every
+    unordered pair exactly once.
+    """
+    n = len(ids)
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        sims = matrix[start:stop] @ matrix[start:].T
+        rows, cols = np.nonzero(sims >= threshold)
+        keep = cols > rows
+        rows, cols = rows[keep], cols[keep]
+        if rows.size:
+            yield rows + start, cols + start, sims[rows, cols]
+
+
+def group_pairs(pairs: list[tuple[int, int]]) -> list[list[int]]:
+    """Connected components over duplicate pairs (union-find)."""
+    parent: dict[int, int] = {}
+
+    def find(x: int) -> int:
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in pairs:
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+
+    groups: dict[int, list[int]] = {}
+    for x in parent:
+        groups.setdefault(find(x), []).append(x)
+    return sorted((sorted(g) for g in groups.values()), key=lambda g: (-len(g), g[0]))
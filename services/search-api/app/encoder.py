@@ -0,0 +1,254 @@
+import asyncio
+import logging
+import math
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import torch
+from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+from app.cache import TTLCache
+from app.config import (
+    MODEL_NAME, MODEL_BACKEND, ONNX_QUANT_CONFIG, ONNX_MODEL_DIR, ENCODE_WORKERS,
+    ENCODE_BATCH_MAX_SIZE, ENCODE_BATCH_MAX_WAIT_MS,
+    QUERY_CACHE_SIZE, QUERY_CACHE_TTL,
+)
+
+logger = logging.getLogger("search-api")
+
+model: SentenceTransformer | None = None
+
+# Inference runs only here, never on the event loop or the default threadpool,
+# so DB waits cannot occupy an encode slot and concurrency is capped at ENCODE_WORKERS.
+executor = ThreadPoolExecutor(max_workers=ENCODE_WORKERS, thread_name_prefix="encode")
+
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def build_model(backend: str = MODEL_BACKEND) -> SentenceTransformer:
+    """Load MODEL_NAME with the given inference backend.
+
+    "torch" is the fp32 PyTorch model, "onnx" the same weights on ONNX
+    Runtime, "onnx-int8" a dynamically quantized ONNX export. The int8 file
+    is exported once from the same weights into ONNX_MODEL_DIR and reused.
+    """
+    if backend == "torch":
+        return SentenceTransformer(MODEL_NAME)
+    if backend == "onnx":
+        return SentenceTransformer(MODEL_NAME, backend="onnx")
+    if backend != "onnx-int8":
+        raise ValueError(f"Unknown MODEL_BACKEND: {backend!r} (expected one of {BACKENDS})")
+
+    local_dir = Path(ONNX_MODEL_DIR) / MODEL_NAME.replace("/", "__")
+    file_name = f"onnx/model_qint8_{ONNX_QUANT_CONFIG}.onnx"
+    if not (local_dir / file_name).exists():
+        logger.info("Exporting int8 ONNX model (%s) to %s", ONNX_QUANT_CONFIG, local_dir)
+        base = SentenceTransformer(MODEL_NAME, backend="onnx")
+        base.save_pretrained(str(local_dir))
+        export_dynamic_quantized_onnx_model(base, ONNX_QUANT_CONFIG, str(local_dir))
+    return SentenceTransformer(str(local_dir), backend="onnx", model_kwargs={"file_name": file_name})
+
+
+def load_model():
+    global model
+    logger.info("Loading model: %s (backend: %s)", MODEL_NAME, MODEL_BACKEND)
+    model = build_model()
+    logger.info("Model loaded (encode workers: %d)", ENCODE_WORKERS)
+
+
+def encode_query(text: str):
+    return model.encode(f"query: {text}", normalize_embeddings=True)
+
+
+def encode_queries(texts: list[str]):
+    return model.encode(
+        [f"query: {t}" for t in texts],
+        batch_size=len(texts),
+        normalize_embeddings=True,
+        show_progress_bar=False,
+    )
+
+
+def encode_passage(text: str):
+    return model.encode(f"passage: {text}", normalize_embeddings=True)
+
+
+def encode_passages(texts: list[str]):
+    return model.encode(
+        [f"passage: {t}" for t in texts],
+        normalize_embeddings=True,
+        show_progress_bar=False,
+    )
+
+
+async def run_encode(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+
+def _init_passage_worker(torch_threads: int):
+    torch.set_num_threads(torch_threads)
+    load_model()
+
+
+def open_passage_workers(processes: int, torch_threads: int) -> ProcessPoolExecutor:
+    """Process pool for bulk passage encoding; each worker loads the model once."""
+    return ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_passage_worker,
+        initargs=(torch_threads,),
+    )
+
+
+async def encode_passages_parallel(workers: ProcessPoolExecutor, processes: int, texts: list[str]):
+    """Split texts across worker processes and reassemble vectors in input order."""
+    size = math.ceil(len(texts) / processes)
+    parts = [texts[i:i + size] for i in range(0, len(texts), size)]
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(*(loop.run_in_executor(workers, encode_passages, part) for part in parts))
+    return np.concatenate(results)
+
+
+class QueryBatcher:
+    """Coalesces concurrent query encodes into one batched model call.
+
+    A batch is dispatched when it reaches max_batch_size or when its first
+    item has waited max_wait_ms. While all encode workers are busy the queue
+    keeps filling, so batches grow with load.
+    """
+
+    def __init__(self, max_batch_size: int, max_wait_ms: float):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self._queue: asyncio.Queue | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._task: asyncio.Task | None = None
+        self._inflight: set[asyncio.Task] = set()
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self.queue_delay_total = 0.0
+        self.queue_delay_max = 0.0
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(ENCODE_WORKERS)
+        self._task = asyncio.create_task(self._collect())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, *self._inflight, return_exceptions=True)
+            self._task = None
+
+    async def encode(self, text: str):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, time.perf_counter(), future))
+        return await future
+
+    async def _collect(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = batch[0][1] + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._slots.acquire()
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            task = asyncio.create_task(self._run(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _run(self, batch: list):
+        dispatched = time.perf_counter()
+        for _, enqueued, _ in batch:
+            delay = dispatched - enqueued
+            self.queue_delay_total += delay
+            self.queue_delay_max = max(self.queue_delay_max, delay)
+        self.batches += 1
+        self.items += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+
+        try:
+            vectors = await run_encode(encode_queries, [text for text, _, _ in batch])
+        except Exception as exc:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+        else:
+            for (_, _, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+        finally:
+            self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "queries": self.items,
+            "avg_batch_size": round(self.items / self.batches, 3) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "queue_delay_ms_avg": round(self.queue_delay_total / self.items * 1000, 3) if self.items else 0.0,
+            "queue_delay_ms_max": round(self.queue_delay_max * 1000, 3),
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+        }
+
+
+batcher = QueryBatcher(ENCODE_BATCH_MAX_SIZE, ENCODE_BATCH_MAX_WAIT_MS)
+query_cache = TTLCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL)
+
+
+def normalize_query(text: str) -> str:
+    """Cache key for text: whitespace collapsed, case kept (the e5 tokenizer is cased)."""
+    return " ".join(text.split())
+
+
+async def embed_query(text: str):
+    """Query vector for text, served from query_cache when possible."""
+    key = normalize_query(text)
+    vector = query_cache.get(key)
+    if vector is None:
+        vector = await batcher.encode(text)
+        query_cache.put(key, vector)
+    return vector
+
+
+async def embed_queries(texts: list[str]) -> list:
+    """Query vectors for texts in order; cache misses are encoded in one model call."""
+    keys = [normalize_query(t) for t in texts]
+    originals = dict(zip(keys, texts))
+    vectors = {key: query_cache.get(key) for key in originals}
+    missing = [key for key, vector in vectors.items() if vector is None]
+    if missing:
+        for key, vector in zip(missing, await run_encode(encode_queries, [originals[k] for k in missing])):
+            query_cache.put(key, vector)
+            vectors[key] = vector
+    return [vectors[key] for key in keys]
+
+
+async def warm_query_cache(texts: list[str]) -> int:
+    originals = {normalize_query(t): t for t in texts if t.strip()}
+    if not originals:
+        return 0
+    vectors = await run_encode(encode_queries, list(originals.values()))
+    for key, vector in zip(originals, vectors):
+        query_cache.put(key, vector)
+    return len(originals)
+
+
+def shutdown():
+    executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,55 @@
+from app.config import FTS_WEIGHT, VECTOR_WEIGHT, RRF_K
+
+FUSION_METHODS = ("weighted", "rrf")
+AGGREGATE_METHODS = ("max", "sum")
+
+
+def _ranks(candidates: list[dict], key: str) -> dict[int, int]:
+    ordered = sorted(candidates, key=lambda c: c[key], reverse=True)
+    return {id(c): rank for rank, c in enumerate(ordered, start=1)}
+
+
+def fuse(candidates: list[dict], method: str = "weighted") -> list[dict]:
+    """Score hybrid candidates and return them best first.
+
+    Every candidate carries vec_score, fts_score and fts_match. "weighted" is
+    FTS_WEIGHT * fts_score + VECTOR_WEIGHT * vec_score (the historical hybrid
+    score). "rrf" is Reciprocal Rank Fusion with the same weights applied per
+    list; pages that do not match the tsquery get no FTS contribution.
+    The weighted score is always kept as "weighted_score" for thresholding.
+    """
+    for c in candidates:
+        c["weighted_score"] = FTS_WEIGHT * c["fts_score"] + VECTOR_WEIGHT * c["vec_score"]
+
+    if method == "rrf":
+        vec_ranks = _ranks(candidates, "vec_score")
+        fts_ranks = _ranks([c for c in candidates if c["fts_match"]], "fts_score")
+        for c in candidates:
+            score = VECTOR_WEIGHT / (RRF_K + vec_ranks[id(c)])
+            if id(c) in fts_ranks:
+                score += FTS_WEIGHT / (RRF_K + fts_ranks[id(c)])
+            c["score"] = score
+    else:
+        for c in candidates:
+            c["score"] = c["weighted_score"]
+
+    return sorted(candidates, key=lambda c: c["score"], reverse=True)
+
+
+def aggregate_pages(candidates: list[dict], method: str = "max") -> list[dict]:
+    """Collapse chunk candidates (best first) into one entry per page.
+
+    The page keeps its best chunk (for the snippet) and that chunk's
+    threshold_score; its score is the best chunk score ("max") or the sum
+    of its chunk scores ("sum").
+    """
+    pages: dict[int, dict] = {}
+    for c in candidates:
+        page = pages.get(c["page_id"])
+        if page is None:
+            pages[c["page_id"]] = dict(c)
+            continue
+        page["threshold_score"] = max(page["threshold_score"], c["threshold_score"])
+        if method == "sum":
+            page["score"] += c["score"]
+    return sorted(pages.values(), key=lambda p: p["score"], reverse=True)
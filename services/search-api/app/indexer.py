@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import time
+
+import psycopg
+
+from app import chunks, db
+from app.config import (
+    EMBEDDING_DIM, SNIPPET_LENGTH, FTS_LANGUAGE,
+    INDEX_WRITE_BATCH_SIZE, INDEX_CHUNK_SIZE,
+    INDEX_ENCODE_PROCESSES, INDEX_TORCH_THREADS, CHUNKS_ENABLED,
+)
+from app.encoder import (
+    encode_passages, encode_passages_parallel, open_passage_workers, run_encode,
+)
+from app.jobs import IndexJob
+
+logger = logging.getLogger("search-api")
+
+# Hash of everything that feeds the stored row; a page is re-embedded only
+# when it differs from ai.embeddings.content_hash.
+PAGE_HASH_SQL = """md5(p.title || E'\\n' || COALESCE(p.path, '') || E'\\n' || COALESCE(p.content, ''))"""
+
+STAGE_COLUMNS = (
+    "page_id", "title", "path", "content_preview", "embedding",
+    "fts_text", "content_hash", "source_updated_at",
+)
+STAGE_TYPES = ("int4", "text", "text", "text", "vector", "text", "text", "text")
+
+
+async def upsert_batch(cur: psycopg.AsyncCursor, rows: list[tuple]):
+    """COPY rows (binary, vectors included) into a temp table, then merge once."""
+    await cur.execute(f"""
+        CREATE TEMP TABLE IF NOT EXISTS embeddings_stage (
+            page_id INTEGER,
+            title TEXT,
+            path TEXT,
+            content_preview TEXT,
+            embedding vector({EMBEDDING_DIM}),
+            fts_text TEXT,
+            content_hash TEXT,
+            source_updated_at TEXT
+        ) ON COMMIT DROP
+    """)
+    async with cur.copy(
+        f"COPY embeddings_stage ({', '.join(STAGE_COLUMNS)}) FROM STDIN (FORMAT BINARY)"
+    ) as copy:
+        copy.set_types(STAGE_TYPES)
+        for row in rows:
+            await copy.write_row(row)
+    await cur.execute("""
+        INSERT INTO ai.embeddings (page_id, title, path, content_preview, embedding, fts,
+                                   content_hash, source_updated_at, updated_at)
+        SELECT page_id, title, path, content_preview, embedding,
+               to_tsvector(%s::regconfig, fts_text), content_hash, source_updated_at, NOW()
+        FROM embeddings_stage
+        ON CONFLICT (page_id) DO UPDATE SET
+            title = EXCLUDED.title,
+            path = EXCLUDED.path,
+            content_preview = EXCLUDED.content_preview,
+            embedding = EXCLUDED.embedding,
+            fts = EXCLUDED.fts,
+            content_hash = EXCLUDED.content_hash,
+            source_updated_at = EXCLUDED.source_updated_at,
+            updated_at = NOW()
+    """, (FTS_LANGUAGE,))
+    await cur.execute("TRUNCATE embeddings_stage")
+
+
+# With chunking on, pages indexed before it was enabled have no chunks yet.
+MISSING_CHUNKS_SQL = (
+    "OR NOT EXISTS (SELECT 1 FROM ai.chunks c WHERE c.page_id = p.id)" if CHUNKS_ENABLED else ""
+)
+
+CHANGED_PAGES_SQL = f"""
+    FROM pages p
+    LEFT JOIN ai.embeddings e ON e.page_id = p.id
+    WHERE p."isPublished" = true
+      AND (%s OR e.page_id IS NULL OR e.content_hash IS DISTINCT FROM {PAGE_HASH_SQL}
+           {MISSING_CHUNKS_SQL})
+"""
+
+
+async def write_pages(conn: psycopg.AsyncConnection, pages: list[tuple], embeddings,
+                      chunk_rows: list[tuple], job: IndexJob) -> float:
+    started = time.perf_counter()
+    cur = conn.cursor()
+    rows = [
+        (
+            page_id, title, path, (content or "")[:SNIPPET_LENGTH], embedding,
+            f"{title} {content or ''}", content_hash, source_updated_at,
+        )
+        for (page_id, title, path, content, source_updated_at, content_hash, _), embedding
+        in zip(pages, embeddings)
+    ]
+    for i in range(0, len(rows), INDEX_WRITE_BATCH_SIZE):
+        await upsert_batch(cur, rows[i:i + INDEX_WRITE_BATCH_SIZE])
+    if CHUNKS_ENABLED:
+        await chunks.replace_chunks(cur, [row[0] for row in pages], chunk_rows)
+    await conn.commit()
+    job.written += len(rows)
+    return time.perf_counter() - started
+
+
+async def index_pages(job: IndexJob) -> dict:
+    """Bring ai.embeddings in sync with published Wiki.js pages.
+
+    Only new or changed pages are encoded (all of them when job.full);
+    rows for pages that were removed or unpublished are deleted.
+    Pages are streamed from a server-side cursor in INDEX_CHUNK_SIZE batches
+    and the write of batch N runs while batch N+1 is being encoded, so memory
+    is bounded by a couple of batches regardless of wiki size. With
+    INDEX_ENCODE_PROCESSES > 0 batches are encoded by a process pool that
+    lives only for the duration of the job. With CHUNKS_ENABLED each page is
+    also split into token-bounded passages stored in ai.chunks.
+    """
+    job.phase = "selecting"
+    async with db.pool.connection() as conn:
+        cur = conn.cursor()
+        await cur.execute('SELECT COUNT(*) FROM pages WHERE "isPublished" = true')
+        published = (await cur.fetchone())[0]
+        await cur.execute(f"SELECT COUNT(*) {CHANGED_PAGES_SQL}", (job.full,))
+        job.total = (await cur.fetchone())[0]
+
+    workers = None
+    if INDEX_ENCODE_PROCESSES > 0 and job.total:
+        job.phase = "starting workers"
+        workers = open_passage_workers(INDEX_ENCODE_PROCESSES, INDEX_TORCH_THREADS)
+
+    async def encode_texts(texts: list[str]):
+        if workers is None:
+            return await run_encode(encode_passages, texts)
+        return await encode_passages_parallel(workers, INDEX_ENCODE_PROCESSES, texts)
+
+    try:
+        return await _sync_pages(job, published, encode_texts)
+    finally:
+        if workers is not None:
+            workers.shutdown(wait=False, cancel_futures=True)
+
+
+async def _sync_pages(job: IndexJob, published: int, encode_texts) -> dict:
+    encode_seconds = write_seconds = 0.0
+    added = 0
+    job.phase = "indexing"
+    async with db.pool.connection() as read_conn, db.pool.connection() as write_conn:
+        read_cur = read_conn.cursor(name="index_pages")
+        await read_cur.execute(f"""
+            SELECT p.id, p.title, p.path, p.content, p."updatedAt"::text, {PAGE_HASH_SQL},
+                   e.page_id IS NULL AS is_new
+            {CHANGED_PAGES_SQL}
+            ORDER BY p.id
+        """, (job.full,))
+
+        pending: asyncio.Task | None = None
+        try:
+            while pages := await read_cur.fetchmany(INDEX_CHUNK_SIZE):
+                started = time.perf_counter()
+                texts = [f"{row[1]}\n{row[3] or ''}" for row in pages]
+                chunk_rows = []
+                if CHUNKS_ENABLED:
+                    # Page and chunk passages go through one batched encode call.
+                    split = await asyncio.to_thread(lambda: [chunks.page_chunks(row[3]) for row in pages])
+                    chunk_rows = [
+                        (row[0], no, part, chunks.chunk_passage(row[1], part))
+                        for row, parts in zip(pages, split)
+                        for no, part in enumerate(parts)
+                    ]
+                    texts += [r[3] for r in chunk_rows]
+                vectors = await encode_texts(texts)
+                embeddings = vectors[:len(pages)]
+                chunk_rows = [
+                    (page_id, no, part, vector, passage)
+                    for (page_id, no, part, passage), vector in zip(chunk_rows, vectors[len(pages):])
+                ]
+                encode_seconds += time.perf_counter() - started
+                job.encoded += len(pages)
+                added += sum(1 for row in pages if row[6])
+
+                if pending is not None:
+                    write_seconds += await pending
+                pending = asyncio.create_task(write_pages(write_conn, pages, embeddings, chunk_rows, job))
+            if pending is not None:
+                write_seconds += await pending
+                pending = None
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+        job.phase = "deleting"
+        write_cur = write_conn.cursor()
+        await write_cur.execute("""
+            DELETE FROM ai.embeddings e
+            WHERE NOT EXISTS (
+                SELECT 1 FROM pages p
+                WHERE p.id = e.page_id AND p."isPublished" = true
+            )
+        """)
+        deleted = write_cur.rowcount
+
+    summary = {
+        "indexed": job.written,
+        "added": added,
+        "updated": job.written - added,
+        "skipped": published - job.total,
+        "deleted": deleted,
+        "timing": {
+            "encode_seconds": round(encode_seconds, 3),
+            "write_seconds": round(write_seconds, 3),
+        },
+    }
+    logger.info("Index sync: %s", summary)
+    return summary
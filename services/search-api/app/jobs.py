@@ -0,0 +1,68 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+
+MAX_KEPT_JOBS = 20
+
+
+class IndexJob:
+    """Progress of one background indexing run, as reported by GET /index/{job_id}."""
+
+    def __init__(self, full: bool):
+        self.id = uuid.uuid4().hex[:12]
+        self.full = full
+        self.status = "queued"
+        self.phase = "queued"
+        self.total = 0
+        self.encoded = 0
+        self.written = 0
+        self.created_at = time.time()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self.error: str | None = None
+        self.summary: dict | None = None
+        self.task: asyncio.Task | None = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    def to_dict(self) -> dict:
+        elapsed = 0.0
+        if self.started_at is not None:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+        rate = self.written / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if self.status == "running" and rate > 0:
+            eta = round((self.total - self.written) / rate, 1)
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "phase": self.phase,
+            "full": self.full,
+            "total": self.total,
+            "encoded": self.encoded,
+            "written": self.written,
+            "elapsed_seconds": round(elapsed, 3),
+            "pages_per_sec": round(rate, 2),
+            "eta_seconds": eta,
+            "error": self.error,
+            "summary": self.summary,
+        }
+
+
+jobs: OrderedDict[str, IndexJob] = OrderedDict()
+
+
+def add(job: IndexJob):
+    jobs[job.id] = job
+    while len(jobs) > MAX_KEPT_JOBS:
+        oldest = next(iter(jobs))
+        if jobs[oldest].active:
+            break
+        del jobs[oldest]
+
+
+def active() -> IndexJob | None:
+    return next((job for job in reversed(jobs.values()) if job.active), None)
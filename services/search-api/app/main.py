@@ -1,52 +1,55 @@
+import asyncio
+import json
 import logging
+import os
+import signal
 import time
 from contextlib import asynccontextmanager
 
-import psycopg2
+import numpy as np
+import psycopg
 from fastapi import FastAPI, Query, HTTPException
-from pgvector.psycopg2 import register_vector
-from sentence_transformers import SentenceTransformer
+from pydantic import BaseModel, Field
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
 
-from app.aliases import expand_query
+from app import (
+    aliases, chunks, db, encoder, indexer, jobs, memory_index, metrics, neighbors, search_log,
+    vector_index,
+)
+from app.aliases import Expansion, expand_query
+from app.cache import ResultCache
+from app.duplicates import group_pairs, iter_pair_blocks
+from app.fusion import AGGREGATE_METHODS, FUSION_METHODS, aggregate_pages, fuse
+from app.startup import Startup
+from app.db import get_raw_connection
 from app.config import (
-    DB_HOST, DB_PORT, DB_USER, DB_PASS, DB_NAME,
-    MODEL_NAME, EMBEDDING_DIM, TOP_K, SNIPPET_LENGTH,
-    FTS_WEIGHT, VECTOR_WEIGHT, FTS_LANGUAGE,
+    EMBEDDING_DIM, TOP_K, MODEL_BACKEND,
+    FTS_LANGUAGE,
     MIN_SCORE_HYBRID, MIN_SCORE_VECTOR, MIN_SCORE_FTS,
+    QUERY_CACHE_WARMUP, RESULT_CACHE_SIZE, RESULT_CACHE_TTL,
+    HYBRID_CANDIDATES, HYBRID_FUSION, CHUNKS_ENABLED, CHUNK_AGGREGATE, MEMORY_INDEX,
+    BATCH_SEARCH_MAX_ITEMS, SIMILAR_NEIGHBORS,
 )
 
 logger = logging.getLogger("search-api")
 logging.basicConfig(level=logging.INFO)
 
-model: SentenceTransformer | None = None
-
-
-def get_raw_connection():
-    return psycopg2.connect(
-        host=DB_HOST,
-        port=DB_PORT,
-        user=DB_USER,
-        password=DB_PASS,
-        dbname=DB_NAME,
-    )
-
+result_cache = ResultCache(RESULT_CACHE_SIZE, RESULT_CACHE_TTL)
+REGISTRY.register(metrics.StatsCollector(result_cache))
+aliases.engine.on_reload = result_cache.bump
 
-def get_connection():
-    conn = get_raw_connection()
-    register_vector(conn)
-    return conn
 
-
-def wait_for_db(retries: int = 30, delay: float = 2.0):
+async def wait_for_db(retries: int = 30, delay: float = 2.0):
     for attempt in range(1, retries + 1):
         try:
-            conn = get_raw_connection()
-            conn.close()
+            conn = await psycopg.AsyncConnection.connect(db.CONNINFO, connect_timeout=5)
+            await conn.close()
             logger.info("Database connection established")
             return
-        except psycopg2.OperationalError:
+        except psycopg.OperationalError:
             logger.warning("DB not ready (attempt %d/%d), retrying...", attempt, retries)
-            time.sleep(delay)
+            await asyncio.sleep(delay)
     raise RuntimeError("Could not connect to database")
 
 
@@ -70,10 +73,42 @@ def init_db():
     cur.execute("""
         ALTER TABLE ai.embeddings ADD COLUMN IF NOT EXISTS fts tsvector;
     """)
+    cur.execute("""
+        ALTER TABLE ai.embeddings
+            ADD COLUMN IF NOT EXISTS content_hash TEXT,
+            ADD COLUMN IF NOT EXISTS source_updated_at TEXT;
+    """)
     cur.execute("""
         CREATE INDEX IF NOT EXISTS idx_embeddings_fts
         ON ai.embeddings USING gin(fts);
     """)
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS ai.chunks (
+            id SERIAL PRIMARY KEY,
+            page_id INTEGER NOT NULL REFERENCES ai.embeddings(page_id) ON DELETE CASCADE,
+            chunk_no INTEGER NOT NULL,
+            content TEXT NOT NULL,
+            embedding vector({EMBEDDING_DIM}) NOT NULL,
+            fts tsvector,
+            UNIQUE (page_id, chunk_no)
+        );
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_chunks_fts
+        ON ai.chunks USING gin(fts);
+    """)
+    vector_index.ensure_index(cur, "ai.embeddings")
+    vector_index.ensure_index(cur, "ai.chunks")
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS ai.page_neighbors (
+            page_id INTEGER PRIMARY KEY REFERENCES ai.embeddings(page_id) ON DELETE CASCADE,
+            neighbor_ids INTEGER[] NOT NULL,
+            scores REAL[] NOT NULL,
+            computed_at TIMESTAMP NOT NULL DEFAULT NOW()
+        );
+    """)
+    # Staleness is judged by updated_at vs computed_at; the hash column is unused.
+    cur.execute("ALTER TABLE ai.page_neighbors DROP COLUMN IF EXISTS content_hash;")
     cur.execute("""
         CREATE TABLE IF NOT EXISTS ai.search_log (
             id SERIAL PRIMARY KEY,
@@ -83,234 +118,601 @@ def init_db():
             created_at TIMESTAMP DEFAULT NOW()
         );
     """)
+    cur.execute("""
+        ALTER TABLE ai.search_log ADD COLUMN IF NOT EXISTS latency_ms REAL;
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_search_log_created_at
+        ON ai.search_log (created_at);
+    """)
+    cur.execute("SELECT to_regclass('ai.search_stats_daily') IS NULL")
+    backfill = cur.fetchone()[0]
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS ai.search_stats_daily (
+            day DATE NOT NULL,
+            query TEXT NOT NULL,
+            mode TEXT NOT NULL,
+            searches INTEGER NOT NULL,
+            zero_results INTEGER NOT NULL,
+            latency_ms_total DOUBLE PRECISION NOT NULL DEFAULT 0,
+            latency_count INTEGER NOT NULL DEFAULT 0,
+            latency_ms_max REAL,
+            PRIMARY KEY (day, query, mode)
+        );
+    """)
+    if backfill:
+        # First start with aggregates: fold the existing raw log in once.
+        cur.execute("""
+            INSERT INTO ai.search_stats_daily
+            SELECT created_at::date, query, mode, COUNT(*),
+                   COUNT(*) FILTER (WHERE results_count = 0),
+                   COALESCE(SUM(latency_ms), 0), COUNT(latency_ms), MAX(latency_ms)
+            FROM ai.search_log
+            GROUP BY 1, 2, 3
+        """)
+        logger.info("Backfilled ai.search_stats_daily with %d rows", cur.rowcount)
     conn.commit()
     cur.close()
     conn.close()
-    logger.info("Database schema initialized (ai.embeddings, ai.search_log)")
+    logger.info("Database schema initialized (ai.embeddings, ai.chunks, ai.search_log, ai.search_stats_daily)")
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    global model
-    logger.info("Loading model: %s", MODEL_NAME)
-    model = SentenceTransformer(MODEL_NAME)
-    logger.info("Model loaded")
+def vector_text_for(q: str, rewritten_q: str | None) -> str:
+    return f"{q} {rewritten_q}" if rewritten_q else q
 
-    wait_for_db()
-    init_db()
 
-    yield
+async def warm_query_cache():
+    if QUERY_CACHE_WARMUP <= 0:
+        return
+    try:
+        async with db.pool.connection() as conn:
+            cur = conn.cursor()
+            await cur.execute("""
+                SELECT query, SUM(searches) AS cnt
+                FROM ai.search_stats_daily
+                WHERE mode <> 'fts'
+                GROUP BY query
+                ORDER BY cnt DESC
+                LIMIT %s
+            """, (QUERY_CACHE_WARMUP,))
+            rows = await cur.fetchall()
+        texts = [vector_text_for(q, expand_query(q)[1]) for q, _ in rows]
+        warmed = await encoder.warm_query_cache(texts)
+        logger.info("Query embedding cache warmed with %d entries", warmed)
+    except Exception as e:
+        logger.warning("Query cache warm-up failed: %s", e)
 
 
-app = FastAPI(title="Coskb Search API", lifespan=lifespan)
+startup = Startup()
+
+
+async def start_db():
+    await startup.run("db_wait", wait_for_db)
+    await startup.run("init_db", asyncio.to_thread, init_db)
+    await startup.run("db_pool", db.open_pool)
+    search_log.writer.start()
+    if MEMORY_INDEX:
+        await startup.run("memory_index", refresh_memory_index)
+    startup.db_ready = True
+
+
+async def start_model():
+    await startup.run("model_load", asyncio.to_thread, encoder.load_model)
+    encoder.batcher.start()
+    startup.model_ready = True
 
 
-def encode_query(text: str):
-    return model.encode(f"query: {text}", normalize_embeddings=True)
+async def start_services():
+    """Bring up DB and model concurrently; FTS is served as soon as the DB is ready.
 
+    A failed phase stops the process, as a failed lifespan did before, so the
+    container restart policy retries instead of leaving the API at 503.
+    """
+    results = await asyncio.gather(start_db(), start_model(), return_exceptions=True)
+    if any(isinstance(r, Exception) for r in results):
+        logger.error("Startup failed (%s), shutting down", startup.errors)
+        os.kill(os.getpid(), signal.SIGTERM)
+        return
+    if startup.ready:
+        await startup.run("cache_warmup", warm_query_cache)
+        logger.info("search-api ready in %.2fs", time.time() - startup.started_at)
 
-def encode_passage(text: str):
-    return model.encode(f"passage: {text}", normalize_embeddings=True)
+
+async def refresh_memory_index():
+    async with db.pool.connection() as conn:
+        await memory_index.index.refresh(conn)
+
+
+def use_memory_index() -> bool:
+    return MEMORY_INDEX and memory_index.index.loaded
+
+
+def require_ready(model: bool = False):
+    if not startup.db_ready:
+        raise HTTPException(status_code=503, detail="Database not ready yet")
+    if model and not startup.model_ready:
+        raise HTTPException(status_code=503, detail="Model not loaded yet")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    startup_task = asyncio.create_task(start_services())
+
+    yield
+
+    if not startup_task.done():
+        startup_task.cancel()
+        await asyncio.gather(startup_task, return_exceptions=True)
+    job = jobs.active()
+    if job is not None and job.task is not None:
+        job.task.cancel()
+        await asyncio.gather(job.task, return_exceptions=True)
+    await encoder.batcher.stop()
+    await search_log.writer.stop()
+    await db.close_pool()
+    encoder.shutdown()
+
+
+app = FastAPI(title="Coskb Search API", lifespan=lifespan)
 
 
 @app.get("/health")
-def health():
+async def health():
     try:
-        conn = get_raw_connection()
-        conn.close()
+        async with db.pool.connection(timeout=2) as conn:
+            await conn.execute("SELECT 1")
         db_ok = True
     except Exception:
         db_ok = False
 
     return {
-        "status": "ok" if db_ok else "degraded",
-        "model_loaded": model is not None,
+        "status": "ok" if db_ok and startup.model_ready else "degraded",
+        "model_loaded": startup.model_ready,
         "db_connected": db_ok,
     }
 
 
-@app.post("/index")
-def index_pages():
-    conn = get_connection()
-    cur = conn.cursor()
+@app.get("/health/live")
+async def health_live():
+    return {"status": "alive", "uptime_seconds": round(time.time() - startup.started_at, 1)}
 
-    cur.execute("""
-        SELECT id, title, path, content
-        FROM pages
-        WHERE "isPublished" = true
-    """)
-    pages = cur.fetchall()
-
-    if not pages:
-        cur.close()
-        conn.close()
-        return {"indexed": 0, "message": "No published pages found"}
-
-    texts = [f"{row[1]}\n{row[3] or ''}" for row in pages]
-    embeddings = model.encode(
-        [f"passage: {t}" for t in texts],
-        normalize_embeddings=True,
-        show_progress_bar=False,
-    )
 
-    for (page_id, title, path, content), embedding in zip(pages, embeddings):
-        preview = (content or "")[:SNIPPET_LENGTH]
-        fts_text = f"{title} {content or ''}"
-        cur.execute("""
-            INSERT INTO ai.embeddings (page_id, title, path, content_preview, embedding, fts, updated_at)
-            VALUES (%s, %s, %s, %s, %s, to_tsvector(%s, %s), NOW())
-            ON CONFLICT (page_id) DO UPDATE SET
-                title = EXCLUDED.title,
-                path = EXCLUDED.path,
-                content_preview = EXCLUDED.content_preview,
-                embedding = EXCLUDED.embedding,
-                fts = EXCLUDED.fts,
-                updated_at = NOW()
-        """, (page_id, title, path, preview, embedding.tolist(), FTS_LANGUAGE, fts_text))
+@app.get("/health/ready")
+async def health_ready():
+    return JSONResponse(startup.to_dict(), status_code=200 if startup.ready else 503)
 
-    conn.commit()
-    count = len(pages)
-    cur.close()
-    conn.close()
 
-    logger.info("Indexed %d pages", count)
-    return {"indexed": count}
+@app.get("/pool-stats")
+async def pool_stats():
+    return db.pool_stats()
 
 
-@app.get("/search")
-def search(
-    q: str = Query(..., min_length=1, description="Search query"),
-    top_k: int = Query(default=TOP_K, ge=1, le=20),
-    mode: str = Query(default="hybrid", description="Search mode: hybrid, vector, fts"),
+@app.get("/encoder-stats")
+async def encoder_stats():
+    return {
+        "backend": MODEL_BACKEND,
+        **encoder.batcher.stats(),
+        "query_cache": encoder.query_cache.stats(),
+    }
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.get("/search-log-stats")
+async def search_log_stats():
+    return search_log.writer.stats()
+
+
+@app.get("/cache-stats")
+async def cache_stats():
+    return {**result_cache.stats(), "query_expansion": aliases.engine.stats()}
+
+
+async def run_index_job(job: jobs.IndexJob):
+    job.status = "running"
+    job.started_at = time.time()
+    try:
+        job.summary = await indexer.index_pages(job)
+        job.status = "done"
+        job.phase = "done"
+    except asyncio.CancelledError:
+        job.status = "cancelled"
+        raise
+    except Exception as e:
+        logger.exception("Index job %s failed", job.id)
+        job.status = "failed"
+        job.error = str(e)
+    finally:
+        job.finished_at = time.time()
+        metrics.observe_index_job(job)
+        # Even a failed run may have committed some chunks.
+        if job.written or (job.summary and job.summary["deleted"]):
+            if MEMORY_INDEX:
+                try:
+                    await refresh_memory_index()
+                except Exception as e:
+                    logger.warning("Memory index refresh failed: %s", e)
+            result_cache.bump()
+        # Also after runs that changed nothing, so lists missing from an
+        # earlier failed refresh are filled in.
+        if SIMILAR_NEIGHBORS > 0 and job.status != "cancelled":
+            try:
+                async with db.pool.connection() as conn:
+                    await neighbors.refresh(conn)
+            except Exception as e:
+                logger.warning("Neighbour lists refresh failed: %s", e)
+
+
+@app.post("/index", status_code=202)
+async def index_pages(
+    full: bool = Query(default=False, description="Re-embed every page, not only changed ones"),
+    wait: bool = Query(default=False, description="Block until the job finishes"),
 ):
-    if model is None:
-        raise HTTPException(status_code=503, detail="Model not loaded yet")
+    require_ready(model=True)
+    job = jobs.active()
+    if job is None:
+        job = jobs.IndexJob(full)
+        jobs.add(job)
+        job.task = asyncio.create_task(run_index_job(job))
+    if wait:
+        await asyncio.shield(job.task)
+    return job.to_dict()
 
-    original_q, rewritten_q = expand_query(q)
-    vector_text = f"{q} {rewritten_q}" if rewritten_q else q
 
-    conn = get_connection()
-    cur = conn.cursor()
+@app.get("/index/{job_id}")
+async def index_job_status(job_id: str):
+    job = jobs.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Index job not found")
+    return job.to_dict()
 
-    if mode == "fts":
-        if rewritten_q:
-            cur.execute("""
-                SELECT page_id, title, path, content_preview,
-                       ts_rank(fts, plainto_tsquery(%s, %s) || plainto_tsquery(%s, %s)) AS score
-                FROM ai.embeddings
-                WHERE fts @@ (plainto_tsquery(%s, %s) || plainto_tsquery(%s, %s))
-                ORDER BY score DESC
-                LIMIT %s
-            """, (FTS_LANGUAGE, q, FTS_LANGUAGE, rewritten_q,
-                  FTS_LANGUAGE, q, FTS_LANGUAGE, rewritten_q, top_k))
-        else:
-            cur.execute("""
+
+def tsquery_sql(expansion: Expansion) -> str:
+    """One tsquery: plain text outside alias phrases AND an OR group per alias phrase."""
+    if expansion.alias_tsquery:
+        return "(plainto_tsquery(%(lang)s, %(fq)s) && to_tsquery(%(lang)s, %(aq)s))"
+    return "plainto_tsquery(%(lang)s, %(q)s)"
+
+
+def to_result(page_id: int, title: str, path: str | None, preview: str | None, score: float) -> dict:
+    return {
+        "page_id": page_id,
+        "title": title,
+        "path": path,
+        "snippet": (preview or "")[:200],
+        "score": round(float(score), 4),
+    }
+
+
+async def fetch_page_meta(cur: psycopg.AsyncCursor, page_ids: list[int]) -> dict[int, tuple]:
+    """(page_id, title, path, content_preview) for the given pages, keyed by page_id."""
+    await cur.execute(
+        "SELECT page_id, title, path, content_preview FROM ai.embeddings WHERE page_id = ANY(%s)",
+        (page_ids,),
+    )
+    return {r[0]: r for r in await cur.fetchall()}
+
+
+def score_candidates(candidates: list[dict], mode: str, fusion: str) -> list[dict]:
+    """Set score (for ranking) and threshold_score (for MIN_SCORE_*) on candidates, best first."""
+    if mode not in ("fts", "vector"):
+        candidates = fuse(candidates, fusion)
+        for c in candidates:
+            c["threshold_score"] = c["weighted_score"]
+        return candidates
+    key = "vec_score" if mode == "vector" else "fts_score"
+    for c in candidates:
+        c["score"] = c["threshold_score"] = c[key]
+    return sorted(candidates, key=lambda c: c["score"], reverse=True)
+
+
+async def run_search(q: str, mode: str, top_k: int, fusion: str = HYBRID_FUSION,
+                     ef_search: int | None = None, probes: int | None = None,
+                     aggregate: str = CHUNK_AGGREGATE,
+                     stages: metrics.Stages | None = None,
+                     query_vec=None, conn: psycopg.AsyncConnection | None = None) -> list[dict]:
+    """Ranked results for one query.
+
+    query_vec skips encoding when the caller already has the vector, and conn
+    runs the queries on that connection instead of one from the pool.
+    """
+    stages = stages or metrics.Stages()
+    t = time.perf_counter()
+    expansion = expand_query(q)
+    vector_text = vector_text_for(q, expansion.rewritten)
+    t = stages.lap("expand", t)
+    if query_vec is None and mode != "fts":
+        query_vec = await encoder.embed_query(vector_text)
+    t = stages.lap("encode", t)
+    tsq = tsquery_sql(expansion)
+    params = {
+        "lang": FTS_LANGUAGE, "q": q, "fq": expansion.fts_text, "aq": expansion.alias_tsquery,
+        "vec": query_vec,
+        "top_k": top_k, "n": max(HYBRID_CANDIDATES, top_k),
+    }
+
+    min_score = {"vector": MIN_SCORE_VECTOR, "fts": MIN_SCORE_FTS}.get(mode, MIN_SCORE_HYBRID)
+
+    if CHUNKS_ENABLED:
+        async with db.connection(conn) as conn:
+            candidates = await chunks.fetch_candidates(conn.cursor(), mode, tsq, params, ef_search, probes)
+        t = stages.lap("db", t)
+        pages = aggregate_pages(score_candidates(candidates, mode, fusion), aggregate)
+        results = [
+            to_result(p["page_id"], p["title"], p["path"], p["preview"], p["score"])
+            for p in pages
+            if round(p["threshold_score"], 4) >= min_score
+        ][:top_k]
+        stages.lap("rank", t)
+        return results
+
+    async with db.connection(conn) as conn:
+        cur = conn.cursor()
+
+        if mode == "fts":
+            await cur.execute(f"""
                 SELECT page_id, title, path, content_preview,
-                       ts_rank(fts, plainto_tsquery(%s, %s)) AS score
+                       ts_rank(fts, {tsq}) AS score
                 FROM ai.embeddings
-                WHERE fts @@ plainto_tsquery(%s, %s)
+                WHERE fts @@ {tsq}
                 ORDER BY score DESC
-                LIMIT %s
-            """, (FTS_LANGUAGE, q, FTS_LANGUAGE, q, top_k))
-
-    elif mode == "vector":
-        query_vec = encode_query(vector_text)
-        cur.execute("""
-            SELECT page_id, title, path, content_preview,
-                   1 - (embedding <=> %s::vector) AS score
-            FROM ai.embeddings
-            ORDER BY embedding <=> %s::vector
-            LIMIT %s
-        """, (query_vec.tolist(), query_vec.tolist(), top_k))
-
-    else:
-        query_vec = encode_query(vector_text)
-        if rewritten_q:
-            cur.execute("""
-                WITH vec AS (
-                    SELECT page_id,
-                           1 - (embedding <=> %s::vector) AS vec_score
-                    FROM ai.embeddings
-                ),
-                fts AS (
-                    SELECT page_id,
-                           ts_rank(fts, plainto_tsquery(%s, %s) || plainto_tsquery(%s, %s)) AS fts_score
+                LIMIT %(top_k)s
+            """, params)
+            rows = await cur.fetchall()
+
+        elif mode == "vector" and use_memory_index():
+            hits = memory_index.index.search(query_vec, top_k)
+            meta = await fetch_page_meta(cur, [pid for pid, _ in hits])
+            rows = [(*meta[pid], score) for pid, score in hits if pid in meta]
+
+        elif mode == "vector":
+            await vector_index.apply_search_params(cur, top_k, ef_search, probes)
+            await cur.execute(f"""
+                SELECT e.page_id, e.title, e.path, e.content_preview, vec.vec_score
+                FROM ({vector_index.nearest_sql("ai.embeddings", "page_id", "top_k")}) vec
+                JOIN ai.embeddings e ON e.page_id = vec.page_id
+                ORDER BY vec.vec_score DESC
+            """, params)
+            rows = await cur.fetchall()
+
+        elif use_memory_index():
+            # Vector candidates come from the in-memory matrix; the DB only
+            # supplies FTS candidates and metadata for the union.
+            hits = memory_index.index.search(query_vec, params["n"])
+            await cur.execute(f"""
+                WITH fts AS (
+                    SELECT page_id
                     FROM ai.embeddings
+                    WHERE fts @@ {tsq}
+                    ORDER BY ts_rank(fts, {tsq}) DESC
+                    LIMIT %(n)s
                 )
                 SELECT e.page_id, e.title, e.path, e.content_preview,
-                       (%s * COALESCE(fts.fts_score, 0) + %s * vec.vec_score) AS score
+                       COALESCE(ts_rank(e.fts, {tsq}), 0) AS fts_score,
+                       COALESCE(e.fts @@ {tsq}, false) AS fts_match
                 FROM ai.embeddings e
-                JOIN vec ON vec.page_id = e.page_id
-                JOIN fts ON fts.page_id = e.page_id
-                ORDER BY score DESC
-                LIMIT %s
-            """, (query_vec.tolist(), FTS_LANGUAGE, q, FTS_LANGUAGE, rewritten_q,
-                  FTS_WEIGHT, VECTOR_WEIGHT, top_k))
+                WHERE e.page_id = ANY(%(ids)s) OR e.page_id IN (SELECT page_id FROM fts)
+            """, {**params, "ids": [pid for pid, _ in hits]})
+            rows = await cur.fetchall()
+            vec_scores = memory_index.index.scores(query_vec, [r[0] for r in rows])
+            candidates = [
+                {
+                    "page_id": r[0], "title": r[1], "path": r[2], "preview": r[3],
+                    "vec_score": vec_scores.get(r[0], 0.0), "fts_score": float(r[4]), "fts_match": r[5],
+                }
+                for r in rows
+            ]
+
         else:
-            cur.execute("""
-                WITH vec AS (
-                    SELECT page_id,
-                           1 - (embedding <=> %s::vector) AS vec_score
-                    FROM ai.embeddings
-                ),
+            # Two-stage hybrid: top-N from the vector index and top-N from the
+            # GIN FTS index, then both scores computed for the union only.
+            await vector_index.apply_search_params(cur, params["n"], ef_search, probes)
+            await cur.execute(f"""
+                WITH vec AS ({vector_index.nearest_sql("ai.embeddings", "page_id")}),
                 fts AS (
-                    SELECT page_id,
-                           ts_rank(fts, plainto_tsquery(%s, %s)) AS fts_score
+                    SELECT page_id
                     FROM ai.embeddings
+                    WHERE fts @@ {tsq}
+                    ORDER BY ts_rank(fts, {tsq}) DESC
+                    LIMIT %(n)s
                 )
                 SELECT e.page_id, e.title, e.path, e.content_preview,
-                       (%s * COALESCE(fts.fts_score, 0) + %s * vec.vec_score) AS score
+                       1 - (e.embedding <=> %(vec)s::vector) AS vec_score,
+                       COALESCE(ts_rank(e.fts, {tsq}), 0) AS fts_score,
+                       COALESCE(e.fts @@ {tsq}, false) AS fts_match
                 FROM ai.embeddings e
-                JOIN vec ON vec.page_id = e.page_id
-                JOIN fts ON fts.page_id = e.page_id
-                ORDER BY score DESC
-                LIMIT %s
-            """, (query_vec.tolist(), FTS_LANGUAGE, q,
-                  FTS_WEIGHT, VECTOR_WEIGHT, top_k))
+                WHERE e.page_id IN (SELECT page_id FROM vec UNION SELECT page_id FROM fts)
+            """, params)
+            candidates = [
+                {
+                    "page_id": r[0], "title": r[1], "path": r[2], "preview": r[3],
+                    "vec_score": float(r[4]), "fts_score": float(r[5]), "fts_match": r[6],
+                }
+                for r in await cur.fetchall()
+            ]
+    t = stages.lap("db", t)
+
+    if mode not in ("fts", "vector"):
+        results = [
+            to_result(c["page_id"], c["title"], c["path"], c["preview"], c["score"])
+            for c in score_candidates(candidates, mode, fusion)
+            if round(c["threshold_score"], 4) >= min_score
+        ][:top_k]
+    else:
+        results = [to_result(*row) for row in rows if round(float(row[4]), 4) >= min_score]
+    stages.lap("rank", t)
+    return results
 
-    min_score = {"hybrid": MIN_SCORE_HYBRID, "vector": MIN_SCORE_VECTOR, "fts": MIN_SCORE_FTS}.get(mode, MIN_SCORE_HYBRID)
 
-    results = []
-    for row in cur.fetchall():
-        score = round(float(row[4]), 4)
-        if score < min_score:
-            continue
-        results.append({
-            "page_id": row[0],
-            "title": row[1],
-            "path": row[2],
-            "snippet": (row[3] or "")[:200],
-            "score": score,
-        })
+@app.get("/vector-index")
+async def vector_index_status():
+    require_ready()
+    async with db.pool.connection() as conn:
+        info = await vector_index.index_info(conn)
+    return {**info, "memory": memory_index.index.stats() if MEMORY_INDEX else None}
 
-    results_count = len(results)
+
+@app.post("/vector-index/rebuild")
+async def vector_index_rebuild():
+    require_ready()
     try:
-        cur.execute(
-            "INSERT INTO ai.search_log (query, mode, results_count) VALUES (%s, %s, %s)",
-            (q, mode, results_count),
-        )
-        conn.commit()
-    except Exception as e:
-        logger.warning("Failed to log search: %s", e)
-    cur.close()
-    conn.close()
+        info = await vector_index.rebuild()
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    result_cache.bump()
+    return info
 
-    return {"query": q, "mode": mode, "results": results}
 
+@app.get("/search")
+async def search(
+    q: str = Query(..., min_length=1, description="Search query"),
+    top_k: int = Query(default=TOP_K, ge=1, le=20),
+    mode: str = Query(default="hybrid", description="Search mode: hybrid, vector, fts"),
+    fusion: str = Query(default=HYBRID_FUSION, description="Hybrid fusion: weighted, rrf"),
+    ef_search: int | None = Query(default=None, ge=1, le=1000, description="HNSW ef_search"),
+    probes: int | None = Query(default=None, ge=1, le=1000, description="IVFFlat probes"),
+    aggregate: str = Query(default=CHUNK_AGGREGATE, description="Chunk-to-page scoring: max, sum"),
+    debug: bool = Query(default=False, description="Include per-stage timings in the response"),
+):
+    started = time.perf_counter()
+    if mode not in metrics.MODES:
+        raise HTTPException(status_code=422, detail=f"Unknown mode: {mode}")
+    if fusion not in FUSION_METHODS:
+        raise HTTPException(status_code=422, detail=f"Unknown fusion: {fusion}")
+    if aggregate not in AGGREGATE_METHODS:
+        raise HTTPException(status_code=422, detail=f"Unknown aggregate: {aggregate}")
+    require_ready(model=mode == "vector")
+    # While the model is still loading, hybrid falls back to FTS only.
+    degraded = mode == "hybrid" and not startup.model_ready
+    if degraded:
+        mode = "fts"
+
+    stages = metrics.Stages()
+    t = time.perf_counter()
+    cache_key = result_cache.key(q, mode, top_k, fusion, ef_search, probes, aggregate)
+    results = result_cache.get(cache_key)
+    cache_hit = results is not None
+    t = stages.lap("cache", t)
+    if results is None:
+        results = await run_search(q, mode, top_k, fusion, ef_search, probes, aggregate, stages)
+        t = time.perf_counter()
+        result_cache.put(cache_key, results)
+
+    total_ms = (time.perf_counter() - started) * 1000
+    search_log.writer.log(q, mode, len(results), total_ms)
+    stages.lap("log", t)
+    stages.observe(mode, total_ms)
+
+    response = {"query": q, "mode": mode, "results": results}
+    if degraded:
+        response["degraded"] = True
+    if debug:
+        response["debug"] = {
+            "total_ms": round(total_ms, 3),
+            "cache_hit": cache_hit,
+            "stages_ms": stages.to_dict(),
+        }
+    return response
+
+
+class BatchSearchItem(BaseModel):
+    q: str = Field(..., min_length=1)
+    mode: str = "hybrid"
+    top_k: int = Field(default=TOP_K, ge=1, le=20)
+
+
+class BatchSearchRequest(BaseModel):
+    queries: list[BatchSearchItem] = Field(..., min_length=1, max_length=BATCH_SEARCH_MAX_ITEMS)
+    fusion: str = HYBRID_FUSION
+
+
+@app.post("/search/batch")
+async def search_batch(body: BatchSearchRequest):
+    """Results for many queries in request order.
+
+    Vector queries missing from the caches are encoded in one model call and
+    every search runs on one pooled connection; a failing item gets an
+    "error" instead of results without failing the batch.
+    """
+    if body.fusion not in FUSION_METHODS:
+        raise HTTPException(status_code=422, detail=f"Unknown fusion: {body.fusion}")
+    require_ready()
+
+    items = []
+    for index, item in enumerate(body.queries):
+        mode = item.mode
+        entry = {"query": item.q, "mode": mode, "index": index}
+        if mode not in metrics.MODES:
+            entry["error"] = f"Unknown mode: {mode}"
+        elif mode == "vector" and not startup.model_ready:
+            entry["error"] = "Model not loaded yet"
+        elif mode == "hybrid" and not startup.model_ready:
+            entry["mode"], entry["degraded"] = "fts", True
+        if "error" not in entry:
+            entry["key"] = result_cache.key(item.q, entry["mode"], item.top_k, body.fusion,
+                                            None, None, CHUNK_AGGREGATE)
+            entry["results"] = result_cache.get(entry["key"])
+        items.append((item, entry))
+
+    pending = [(item, entry) for item, entry in items if "error" not in entry and entry["results"] is None]
+    to_encode = [(item, entry) for item, entry in pending if entry["mode"] != "fts"]
+    vectors = {}
+    if to_encode:
+        texts = [vector_text_for(item.q, expand_query(item.q)[1]) for item, _ in to_encode]
+        try:
+            for (_, entry), vector in zip(to_encode, await encoder.embed_queries(texts)):
+                vectors[id(entry)] = vector
+        except Exception as e:
+            logger.warning("Batch search encoding of %d items failed: %s", len(to_encode), type(e).__name__)
+            for _, entry in to_encode:
+                entry["error"] = "Search failed"
+            pending = [(item, entry) for item, entry in pending if "error" not in entry]
+
+    if pending:
+        async with db.pool.connection() as conn:
+            for item, entry in pending:
+                try:
+                    # Own transaction per item (the pooled connection is idle), so a
+                    # failing query is rolled back without affecting the rest.
+                    async with conn.transaction():
+                        entry["results"] = await run_search(
+                            item.q, entry["mode"], item.top_k, body.fusion,
+                            query_vec=vectors.get(id(entry)), conn=conn,
+                        )
+                except Exception as e:
+                    # Neither the query nor the error text (which may quote it) is logged.
+                    logger.warning("Batch search item %d (%s) failed: %s",
+                                   entry["index"], entry["mode"], type(e).__name__)
+                    entry["error"] = "Search failed"
+                    continue
+                result_cache.put(entry["key"], entry["results"])
+
+    response = []
+    for _, entry in items:
+        entry.pop("key", None)
+        entry.pop("index")
+        if "error" in entry:
+            entry.pop("results", None)
+        else:
+            search_log.writer.log(entry["query"], entry["mode"], len(entry["results"]))
+        response.append(entry)
+    return {"items": response}
 
-@app.get("/stats")
-def stats():
-    conn = get_raw_connection()
-    cur = conn.cursor()
 
-    cur.execute("SELECT COUNT(*) FROM ai.embeddings")
-    count = cur.fetchone()[0]
+@app.get("/stats")
+async def stats():
+    require_ready()
+    async with db.pool.connection() as conn:
+        cur = conn.cursor()
 
-    cur.execute("SELECT MAX(updated_at) FROM ai.embeddings")
-    last_update = cur.fetchone()[0]
+        await cur.execute("SELECT COUNT(*) FROM ai.embeddings")
+        count = (await cur.fetchone())[0]
 
-    cur.close()
-    conn.close()
+        await cur.execute("SELECT MAX(updated_at) FROM ai.embeddings")
+        last_update = (await cur.fetchone())[0]
 
     return {
         "indexed_pages": count,
@@ -319,66 +721,108 @@ def stats():
 
 
 @app.get("/search-stats")
-def search_stats(
+async def search_stats(
     top_limit: int = Query(default=10, ge=1, le=50, description="Max top queries"),
     zero_limit: int = Query(default=10, ge=1, le=50, description="Max zero-result queries"),
+    days: int | None = Query(default=None, ge=1, le=3650, description="Only the last N days (default: all)"),
 ):
-    conn = get_raw_connection()
-    cur = conn.cursor()
-
-    cur.execute("""
-        SELECT query, mode, COUNT(*) AS cnt
-        FROM ai.search_log
-        GROUP BY query, mode
-        ORDER BY cnt DESC
-        LIMIT %s
-    """, (top_limit,))
-    top_queries = [{"query": r[0], "mode": r[1], "count": r[2]} for r in cur.fetchall()]
-
-    cur.execute("""
-        SELECT query, mode, COUNT(*) AS cnt
-        FROM ai.search_log
-        WHERE results_count = 0
-        GROUP BY query, mode
-        ORDER BY cnt DESC
-        LIMIT %s
-    """, (zero_limit,))
-    zero_result_queries = [{"query": r[0], "mode": r[1], "count": r[2]} for r in cur.fetchall()]
-
-    cur.close()
-    conn.close()
+    require_ready()
+    # Read from the daily aggregates maintained by the search log writer.
+    window = "WHERE day > CURRENT_DATE - %(days)s::int" if days else ""
+    params = {"days": days, "top": top_limit, "zero": zero_limit}
+    async with db.pool.connection() as conn:
+        cur = conn.cursor()
+
+        await cur.execute(f"""
+            SELECT query, mode, SUM(searches) AS cnt
+            FROM ai.search_stats_daily
+            {window}
+            GROUP BY query, mode
+            ORDER BY cnt DESC
+            LIMIT %(top)s
+        """, params)
+        top_queries = [{"query": r[0], "mode": r[1], "count": int(r[2])} for r in await cur.fetchall()]
+
+        await cur.execute(f"""
+            SELECT query, mode, SUM(zero_results) AS cnt
+            FROM ai.search_stats_daily
+            {window}
+            GROUP BY query, mode
+            HAVING SUM(zero_results) > 0
+            ORDER BY cnt DESC
+            LIMIT %(zero)s
+        """, params)
+        zero_result_queries = [{"query": r[0], "mode": r[1], "count": int(r[2])} for r in await cur.fetchall()]
+
+        await cur.execute(f"""
+            SELECT COALESCE(SUM(searches), 0), COALESCE(SUM(zero_results), 0),
+                   SUM(latency_ms_total) / NULLIF(SUM(latency_count), 0), MAX(latency_ms_max)
+            FROM ai.search_stats_daily
+            {window}
+        """, params)
+        searches, zero_results, latency_avg, latency_max = await cur.fetchone()
 
-    return {"top_queries": top_queries, "zero_result_queries": zero_result_queries}
+    return {
+        "days": days,
+        "totals": {
+            "searches": int(searches),
+            "zero_results": int(zero_results),
+            "latency_ms_avg": round(float(latency_avg), 2) if latency_avg is not None else None,
+            "latency_ms_max": round(float(latency_max), 2) if latency_max is not None else None,
+        },
+        "top_queries": top_queries,
+        "zero_result_queries": zero_result_queries,
+    }
 
 
 @app.get("/similar")
-def similar(
+async def similar(
     page_id: int = Query(..., description="Source page ID"),
     top_k: int = Query(default=5, ge=1, le=20),
+    ef_search: int | None = Query(default=None, ge=1, le=1000, description="HNSW ef_search"),
+    probes: int | None = Query(default=None, ge=1, le=1000, description="IVFFlat probes"),
 ):
-    conn = get_connection()
-    cur = conn.cursor()
+    require_ready()
+    async with db.pool.connection() as conn:
+        cur = conn.cursor()
 
-    cur.execute("SELECT embedding FROM ai.embeddings WHERE page_id = %s", (page_id,))
-    row = cur.fetchone()
-    if not row:
-        cur.close()
-        conn.close()
-        raise HTTPException(status_code=404, detail="Page not found in embeddings")
+        # Lists precomputed by the index job; live search when missing or stale.
+        rows = await neighbors.lookup(cur, page_id, top_k) if SIMILAR_NEIGHBORS > 0 else None
+        if rows is not None:
+            return {"page_id": page_id, "similar": similar_results(rows), "source": "precomputed"}
 
-    source_embedding = row[0]
+        source_embedding = memory_index.index.vector(page_id) if use_memory_index() else None
+        if source_embedding is not None:
+            hits = memory_index.index.search(source_embedding, top_k, exclude=page_id)
+            meta = await fetch_page_meta(cur, [pid for pid, _ in hits])
+            rows = [(*meta[pid], score) for pid, score in hits if pid in meta]
+            return {"page_id": page_id, "similar": similar_results(rows), "source": "memory"}
+
+        await cur.execute("SELECT embedding FROM ai.embeddings WHERE page_id = %s", (page_id,))
+        row = await cur.fetchone()
+        if not row:
+            raise HTTPException(status_code=404, detail="Page not found in embeddings")
+
+        source_embedding = row[0]
+
+        await vector_index.apply_search_params(cur, top_k + 1, ef_search, probes)
+
+        await cur.execute(f"""
+            SELECT e.page_id, e.title, e.path, e.content_preview, vec.vec_score
+            FROM ({vector_index.nearest_sql("ai.embeddings", "page_id", "n")}) vec
+            JOIN ai.embeddings e ON e.page_id = vec.page_id
+            WHERE e.page_id != %(page_id)s
+            ORDER BY vec.vec_score DESC
+            LIMIT %(top_k)s
+        """, {"vec": source_embedding, "page_id": page_id, "n": top_k + 1, "top_k": top_k})
+        rows = await cur.fetchall()
+
+    return {"page_id": page_id, "similar": similar_results(rows), "source": "live"}
 
-    cur.execute("""
-        SELECT page_id, title, path, content_preview,
-               1 - (embedding <=> %s::vector) AS score
-        FROM ai.embeddings
-        WHERE page_id != %s
-        ORDER BY embedding <=> %s::vector
-        LIMIT %s
-    """, (source_embedding, page_id, source_embedding, top_k))
 
+def similar_results(rows) -> list[dict]:
     results = []
-    for r in cur.fetchall():
+    for r in rows:
         score = round(float(r[4]), 4)
         if score < MIN_SCORE_VECTOR:
             continue
@@ -389,40 +833,68 @@ def similar(
             "snippet": (r[3] or "")[:200],
             "score": score,
         })
+    return results
 
-    cur.close()
-    conn.close()
 
-    return {"page_id": page_id, "similar": results}
+async def load_embedding_matrix() -> tuple[list[str], np.ndarray, np.ndarray]:
+    async with db.pool.connection() as conn:
+        cur = conn.cursor()
+        await cur.execute("SELECT page_id, title, embedding FROM ai.embeddings ORDER BY page_id")
+        rows = await cur.fetchall()
+    ids = np.array([r[0] for r in rows], dtype=np.int64)
+    titles = [r[1] for r in rows]
+    matrix = np.array([r[2] for r in rows], dtype=np.float32).reshape(len(rows), EMBEDDING_DIM)
+    return titles, ids, matrix
 
 
 @app.get("/duplicates")
-def duplicates(
+async def duplicates(
     threshold: float = Query(default=0.9, ge=0.5, le=1.0, description="Minimum similarity"),
+    groups: bool = Query(default=False, description="Also cluster pairs into duplicate groups"),
+    stream: bool = Query(default=False, description="Stream pairs as NDJSON"),
 ):
-    conn = get_connection()
-    cur = conn.cursor()
-
-    cur.execute("""
-        SELECT a.page_id, a.title, b.page_id, b.title,
-               1 - (a.embedding <=> b.embedding) AS similarity
-        FROM ai.embeddings a, ai.embeddings b
-        WHERE a.page_id < b.page_id
-          AND 1 - (a.embedding <=> b.embedding) >= %s
-        ORDER BY similarity DESC
-    """, (threshold,))
-
-    pairs = []
-    for r in cur.fetchall():
-        pairs.append({
-            "page_id_1": r[0],
-            "title_1": r[1],
-            "page_id_2": r[2],
-            "title_2": r[3],
-            "score": round(float(r[4]), 4),
-        })
-
-    cur.close()
-    conn.close()
-
-    return {"threshold": threshold, "duplicates": pairs}
+    require_ready()
+    titles, ids, matrix = await load_embedding_matrix()
+
+    def pair_dicts(rows, cols, scores) -> list[dict]:
+        return [
+            {
+                "page_id_1": int(ids[r]),
+                "title_1": titles[r],
+                "page_id_2": int(ids[c]),
+                "title_2": titles[c],
+                "score": round(float(score), 4),
+            }
+            for r, c, score in zip(rows, cols, scores)
+        ]
+
+    def next_block(blocks):
+        block = next(blocks, None)
+        return pair_dicts(*block) if block is not None else None
+
+    if stream:
+        async def ndjson():
+            blocks = iter_pair_blocks(ids, matrix, threshold)
+            found = []
+            while (block := await asyncio.to_thread(next_block, blocks)) is not None:
+                block.sort(key=lambda p: p["score"], reverse=True)
+                found.extend((p["page_id_1"], p["page_id_2"]) for p in block)
+                yield "".join(json.dumps(p, ensure_ascii=False) + "\n" for p in block)
+            if groups:
+                for group in group_pairs(found):
+                    yield json.dumps({"group": group}) + "\n"
+
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    def collect() -> list[dict]:
+        pairs = []
+        for block in iter_pair_blocks(ids, matrix, threshold):
+            pairs.extend(pair_dicts(*block))
+        pairs.sort(key=lambda p: p["score"], reverse=True)
+        return pairs
+
+    pairs = await asyncio.to_thread(collect)
+    response = {"threshold": threshold, "duplicates": pairs}
+    if groups:
+        response["groups"] = group_pairs([(p["page_id_1"], p["page_id_2"]) for p in pairs])
+    return response
@@ -0,0 +1,109 @@
+import logging
+import time
+
+import numpy as np
+import psycopg
+
+from app.config import EMBEDDING_DIM
+
+logger = logging.getLogger("search-api")
+
+
+class MemoryIndex:
+    """All page embeddings as one contiguous float32 matrix for exact in-process top-k.
+
+    Rows are L2-normalized, so a dot product is the cosine similarity that
+    pgvector reports as 1 - (embedding <=> vec). The arrays are replaced as a
+    whole on refresh, so a search never sees a half-updated matrix.
+    """
+
+    def __init__(self):
+        self.ids = np.empty(0, dtype=np.int64)
+        self.matrix = np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+        # (content_hash, updated_at) per page: a full re-embed keeps the hash
+        # but rewrites updated_at, so both are compared.
+        self.versions: dict[int, tuple] = {}
+        self.loaded = False
+        self.refreshed_at: float | None = None
+        self.last_refresh_ms = 0.0
+        self.searches = 0
+
+    async def refresh(self, conn: psycopg.AsyncConnection) -> dict:
+        """Sync with ai.embeddings, fetching vectors only for new or re-embedded pages."""
+        started = time.perf_counter()
+        cur = conn.cursor()
+        await cur.execute("SELECT page_id, content_hash, updated_at FROM ai.embeddings")
+        versions = {pid: (h, updated_at) for pid, h, updated_at in await cur.fetchall()}
+        changed = {pid for pid, v in versions.items() if self.versions.get(pid) != v}
+
+        vectors = {
+            pid: row
+            for pid, row in zip(self.ids.tolist(), self.matrix)
+            if pid in versions and pid not in changed
+        }
+        if changed:
+            await cur.execute(
+                "SELECT page_id, embedding FROM ai.embeddings WHERE page_id = ANY(%s)", (list(changed),)
+            )
+            for pid, embedding in await cur.fetchall():
+                vectors[pid] = np.asarray(embedding, dtype=np.float32)
+        removed = len(self.versions.keys() - versions.keys())
+
+        ids = np.array(sorted(vectors), dtype=np.int64)
+        if len(ids):
+            matrix = np.ascontiguousarray(np.vstack([vectors[pid] for pid in ids.tolist()]))
+            matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        else:
+            matrix = np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+        self.ids, self.matrix, self.versions = ids, matrix, versions
+        self.loaded = True
+        self.refreshed_at = time.time()
+        self.last_refresh_ms = (time.perf_counter() - started) * 1000
+        logger.info(
+            "Memory index refreshed: %d rows (%d changed, %d removed) in %.1f ms",
+            len(ids), len(changed), removed, self.last_refresh_ms,
+        )
+        return {"rows": len(ids), "changed": len(changed), "removed": removed}
+
+    def search(self, vec, k: int, exclude: int | None = None) -> list[tuple[int, float]]:
+        """Top-k (page_id, cosine score) pairs, best first."""
+        ids, matrix = self.ids, self.matrix
+        if not len(ids):
+            return []
+        scores = matrix @ np.asarray(vec, dtype=np.float32)
+        if exclude is not None:
+            scores[ids == exclude] = -np.inf
+        k = min(k, len(ids))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        self.searches += 1
+        return [(int(ids[i]), float(scores[i])) for i in top if np.isfinite(scores[i])]
+
+    def scores(self, vec, page_ids: list[int]) -> dict[int, float]:
+        """Cosine scores of vec against the given pages (missing pages are skipped)."""
+        ids, matrix = self.ids, self.matrix
+        rows = np.searchsorted(ids, page_ids)
+        found = [(pid, r) for pid, r in zip(page_ids, rows) if r < len(ids) and ids[r] == pid]
+        if not found:
+            return {}
+        sims = matrix[[r for _, r in found]] @ np.asarray(vec, dtype=np.float32)
+        return {pid: float(s) for (pid, _), s in zip(found, sims)}
+
+    def vector(self, page_id: int) -> np.ndarray | None:
+        row = np.searchsorted(self.ids, page_id)
+        if row < len(self.ids) and self.ids[row] == page_id:
+            return self.matrix[row]
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "loaded": self.loaded,
+            "rows": int(len(self.ids)),
+            "bytes": int(self.matrix.nbytes),
+            "searches": self.searches,
+            "last_refresh_ms": round(self.last_refresh_ms, 1),
+            "refreshed_at": self.refreshed_at,
+        }
+
+
+index = MemoryIndex()
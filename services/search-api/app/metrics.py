@@ -0,0 +1,111 @@
+import time
+
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from app import db, encoder, jobs, memory_index, search_log
+
+# Label values are limited to known modes so arbitrary ?mode= input cannot add series.
+MODES = ("hybrid", "vector", "fts")
+
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+SEARCH_SECONDS = Histogram(
+    "searchapi_search_seconds", "End-to-end /search latency", ["mode"], buckets=STAGE_BUCKETS,
+)
+STAGE_SECONDS = Histogram(
+    "searchapi_search_stage_seconds", "Time spent in each /search stage", ["mode", "stage"],
+    buckets=STAGE_BUCKETS,
+)
+INDEX_JOBS = Counter("searchapi_index_jobs_total", "Finished index jobs", ["status"])
+INDEX_PAGES = Counter("searchapi_index_pages_written_total", "Pages written by index jobs")
+INDEX_SECONDS = Counter("searchapi_index_seconds_total", "Wall time of finished index jobs")
+
+
+class Stages:
+    """Wall time of the stages of one request, in milliseconds."""
+
+    def __init__(self):
+        self.ms: dict[str, float] = {}
+
+    def lap(self, stage: str, since: float) -> float:
+        """Add the time since `since` to stage; returns now for the next lap."""
+        now = time.perf_counter()
+        self.ms[stage] = self.ms.get(stage, 0.0) + (now - since) * 1000
+        return now
+
+    def observe(self, mode: str, total_ms: float):
+        mode = mode if mode in MODES else "other"
+        SEARCH_SECONDS.labels(mode).observe(total_ms / 1000)
+        for stage, ms in self.ms.items():
+            STAGE_SECONDS.labels(mode, stage).observe(ms / 1000)
+
+    def to_dict(self) -> dict:
+        return {stage: round(ms, 3) for stage, ms in self.ms.items()}
+
+
+def observe_index_job(job: jobs.IndexJob):
+    INDEX_JOBS.labels(job.status).inc()
+    INDEX_PAGES.inc(job.written)
+    if job.started_at is not None and job.finished_at is not None:
+        INDEX_SECONDS.inc(job.finished_at - job.started_at)
+
+
+def _counter(name: str, doc: str, value) -> CounterMetricFamily:
+    return CounterMetricFamily(name, doc, value=value)
+
+
+def _gauge(name: str, doc: str, value) -> GaugeMetricFamily:
+    return GaugeMetricFamily(name, doc, value=value)
+
+
+class StatsCollector:
+    """Exports the existing in-process stats (pool, encoder, caches, log writer) at scrape time."""
+
+    def __init__(self, result_cache):
+        self.result_cache = result_cache
+
+    def collect(self):
+        pool = db.pool_stats()
+        if pool.get("open"):
+            yield _gauge("searchapi_db_pool_size", "Open pool connections", pool["size"])
+            yield _gauge("searchapi_db_pool_in_use", "Pool connections checked out", pool["in_use"])
+            yield _gauge("searchapi_db_pool_waiting", "Requests waiting for a connection", pool["requests_waiting"])
+            yield _counter("searchapi_db_pool_requests", "Connection requests", pool["requests_total"])
+            yield _counter("searchapi_db_pool_wait_seconds", "Time spent waiting for a connection",
+                           pool["wait_ms_total"] / 1000)
+            yield _counter("searchapi_db_pool_timeouts", "Connection requests that timed out",
+                           pool["requests_timeouts"])
+
+        batcher = encoder.batcher.stats()
+        yield _counter("searchapi_model_inference_batches", "Query encode calls", batcher["batches"])
+        yield _counter("searchapi_model_inference_queries", "Queries encoded", batcher["queries"])
+        yield _gauge("searchapi_model_queue", "Queries waiting to be encoded", batcher["queued"])
+
+        caches = CounterMetricFamily("searchapi_cache_lookups", "Cache lookups", labels=["cache", "result"])
+        query_cache = encoder.query_cache.stats()
+        caches.add_metric(["query_embedding", "hit"], query_cache["hits"])
+        caches.add_metric(["query_embedding", "miss"], query_cache["misses"])
+        for mode, s in self.result_cache.stats()["modes"].items():
+            if mode not in MODES:
+                continue
+            caches.add_metric([f"result_{mode}", "hit"], s["hits"])
+            caches.add_metric([f"result_{mode}", "miss"], s["misses"])
+        yield caches
+
+        log = search_log.writer.stats()
+        logged = CounterMetricFamily("searchapi_search_log_rows", "Search log rows", labels=["outcome"])
+        for outcome in ("written", "dropped", "failed"):
+            logged.add_metric([outcome], log[outcome])
+        yield logged
+        yield _gauge("searchapi_search_log_queue", "Search log rows waiting to be written", log["queued"])
+
+        yield _gauge("searchapi_memory_index_rows", "Rows in the in-memory vector index",
+                     len(memory_index.index.ids))
+
+        job = jobs.active()
+        yield _gauge("searchapi_index_job_running", "1 while an index job is running", int(job is not None))
+        if job is not None:
+            progress = job.to_dict()
+            yield _gauge("searchapi_index_job_pages_per_second", "Throughput of the running index job",
+                         progress["pages_per_sec"])
@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import time
+
+import numpy as np
+import psycopg
+
+from app.config import EMBEDDING_DIM, SIMILAR_NEIGHBORS
+
+logger = logging.getLogger("search-api")
+
+BLOCK_SIZE = 256
+
+# A list is stale when its page, or a page it points at, was (re-)embedded
+# after computed_at, or when it points at a page that no longer exists. The
+# same rule decides freshness in LOOKUP_SQL, so whatever lookup rejects is
+# recomputed by the next refresh.
+STALE_COUNT_SQL = """
+    SELECT
+        (SELECT COUNT(*)
+         FROM ai.embeddings e
+         LEFT JOIN ai.page_neighbors n ON n.page_id = e.page_id
+         WHERE n.page_id IS NULL OR e.updated_at > n.computed_at),
+        (SELECT COUNT(*)
+         FROM ai.page_neighbors n
+         WHERE EXISTS (
+             SELECT 1 FROM unnest(n.neighbor_ids) AS x(page_id)
+             LEFT JOIN ai.embeddings e ON e.page_id = x.page_id
+             WHERE e.page_id IS NULL OR e.updated_at > n.computed_at
+         ))
+"""
+
+UPSERT_SQL = """
+    INSERT INTO ai.page_neighbors (page_id, neighbor_ids, scores, computed_at)
+    VALUES (%s, %s, %s, NOW())
+    ON CONFLICT (page_id) DO UPDATE SET
+        neighbor_ids = EXCLUDED.neighbor_ids,
+        scores = EXCLUDED.scores,
+        computed_at = EXCLUDED.computed_at
+"""
+
+# One row per stored neighbour; fresh is false when the neighbour was deleted
+# or re-embedded after the list was computed.
+LOOKUP_SQL = """
+    SELECT x.page_id, e.title, e.path, e.content_preview, x.score,
+           e.page_id IS NOT NULL AND e.updated_at <= n.computed_at AS fresh
+    FROM ai.page_neighbors n
+    JOIN ai.embeddings src
+      ON src.page_id = n.page_id AND src.updated_at <= n.computed_at
+    CROSS JOIN LATERAL unnest(n.neighbor_ids[1:%(top_k)s], n.scores[1:%(top_k)s])
+        WITH ORDINALITY AS x(page_id, score, ord)
+    LEFT JOIN ai.embeddings e ON e.page_id = x.page_id
+    WHERE n.page_id = %(page_id)s
+    ORDER BY x.ord
+"""
+
+
+def stale_rows(ids: np.ndarray, matrix: np.ndarray, updated: list, lists: dict, k: int) -> list[int]:
+    """Rows of matrix whose neighbour list has to be (re)computed.
+
+    lists maps page_id to (computed_at, neighbor_ids, scores). That is pages
+    without a list or embedded after it was computed, pages whose list
+    contains a page embedded after it was computed or deleted, and pages a
+    changed page now beats the current k-th neighbour of. When most pages
+    changed, all rows.
+    """
+    n = len(ids)
+    pos = {pid: i for i, pid in enumerate(ids.tolist())}
+    changed = [i for i, pid in enumerate(ids.tolist()) if pid not in lists or updated[i] > lists[pid][0]]
+    if len(changed) * 2 >= n:
+        return list(range(n))
+    affected = set(changed)
+    kth = np.full(n, -np.inf, dtype=np.float32)
+    for pid, (computed_at, neighbor_ids, scores) in lists.items():
+        i = pos.get(pid)
+        if i is None or i in affected:
+            continue
+        if any(nid not in pos or updated[pos[nid]] > computed_at for nid in neighbor_ids):
+            affected.add(i)
+        elif len(neighbor_ids) < min(k, n - 1):
+            affected.add(i)
+        elif scores:
+            kth[i] = scores[-1]
+    best = np.full(n, -np.inf, dtype=np.float32)
+    for start in range(0, len(changed), BLOCK_SIZE):
+        sims = matrix[changed[start:start + BLOCK_SIZE]] @ matrix.T
+        best = np.maximum(best, sims.max(axis=0))
+    affected.update(np.nonzero(best > kth)[0].tolist())
+    return sorted(affected)
+
+
+def top_neighbors(ids: np.ndarray, matrix: np.ndarray, rows: list[int], k: int) -> list[tuple]:
+    """(page_id, neighbor_ids, scores) for the given rows, best first, the page itself excluded."""
+    k = min(k, len(ids) - 1)
+    result = []
+    for start in range(0, len(rows), BLOCK_SIZE):
+        block = rows[start:start + BLOCK_SIZE]
+        if k <= 0:
+            result += [(int(ids[r]), [], []) for r in block]
+            continue
+        sims = matrix[block] @ matrix.T
+        sims[np.arange(len(block)), block] = -np.inf
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        for r, row_top, row_sims in zip(block, top, sims):
+            row_top = row_top[np.argsort(-row_sims[row_top])]
+            result.append((int(ids[r]), ids[row_top].tolist(), row_sims[row_top].tolist()))
+    return result
+
+
+async def refresh(conn: psycopg.AsyncConnection, k: int = SIMILAR_NEIGHBORS) -> dict:
+    """Bring ai.page_neighbors in sync with ai.embeddings, recomputing only stale lists."""
+    started = time.perf_counter()
+    cur = conn.cursor()
+    await cur.execute(STALE_COUNT_SQL)
+    changed, dangling = await cur.fetchone()
+    if not changed and not dangling:
+        await conn.commit()
+        return {"updated": 0}
+
+    await cur.execute("SELECT page_id, updated_at, embedding FROM ai.embeddings ORDER BY page_id")
+    rows = await cur.fetchall()
+    await cur.execute("SELECT page_id, computed_at, neighbor_ids, scores FROM ai.page_neighbors")
+    lists = {r[0]: (r[1], r[2], r[3]) for r in await cur.fetchall()}
+
+    ids = np.array([r[0] for r in rows], dtype=np.int64)
+    updated = [r[1] for r in rows]
+    if rows:
+        matrix = np.vstack([np.asarray(r[2], dtype=np.float32) for r in rows])
+        matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    else:
+        matrix = np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+
+    def compute():
+        stale = stale_rows(ids, matrix, updated, lists, k)
+        return top_neighbors(ids, matrix, stale, k)
+
+    updates = await asyncio.to_thread(compute)
+    if updates:
+        await cur.executemany(UPSERT_SQL, updates)
+    await conn.commit()
+    summary = {"pages": len(rows), "updated": len(updates), "ms": round((time.perf_counter() - started) * 1000, 1)}
+    logger.info("Neighbour lists refreshed: %s", summary)
+    return summary
+
+
+async def lookup(cur: psycopg.AsyncCursor, page_id: int, top_k: int) -> list[tuple] | None:
+    """Stored (page_id, title, path, preview, score) neighbours, or None when missing or stale."""
+    if top_k > SIMILAR_NEIGHBORS:
+        return None
+    await cur.execute(LOOKUP_SQL, {"page_id": page_id, "top_k": top_k})
+    rows = await cur.fetchall()
+    if not rows or not all(r[5] for r in rows):
+        return None
+    return [r[:5] for r in rows]
@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+
+from app import db
+from app.config import (
+    SEARCH_LOG_QUEUE_SIZE, SEARCH_LOG_BATCH_SIZE, SEARCH_LOG_FLUSH_MS,
+    SEARCH_LOG_RETENTION_DAYS,
+)
+
+logger = logging.getLogger("search-api")
+
+_STOP = object()
+
+PRUNE_INTERVAL = 3600
+
+UPSERT_DAILY_SQL = """
+    INSERT INTO ai.search_stats_daily AS s
+        (day, query, mode, searches, zero_results, latency_ms_total, latency_count, latency_ms_max)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    ON CONFLICT (day, query, mode) DO UPDATE SET
+        searches = s.searches + EXCLUDED.searches,
+        zero_results = s.zero_results + EXCLUDED.zero_results,
+        latency_ms_total = s.latency_ms_total + EXCLUDED.latency_ms_total,
+        latency_count = s.latency_count + EXCLUDED.latency_count,
+        latency_ms_max = GREATEST(s.latency_ms_max, EXCLUDED.latency_ms_max)
+"""
+
+
+def daily_rows(batch: list) -> list[tuple]:
+    """Fold log rows into per (day, query, mode) increments for ai.search_stats_daily."""
+    totals: dict[tuple, list] = {}
+    for query, mode, results_count, latency_ms, created_at in batch:
+        t = totals.setdefault((created_at.date(), query, mode), [0, 0, 0.0, 0, None])
+        t[0] += 1
+        t[1] += results_count == 0
+        if latency_ms is not None:
+            t[2] += latency_ms
+            t[3] += 1
+            t[4] = latency_ms if t[4] is None else max(t[4], latency_ms)
+    return [(*key, *values) for key, values in sorted(totals.items())]
+
+
+class SearchLogWriter:
+    """Background writer for ai.search_log, off the request path.
+
+    log() only enqueues; a single task drains the queue and writes a batch
+    with one COPY once batch_size rows are collected or flush_ms has passed
+    since the first row. The same transaction adds the batch to the daily
+    aggregates in ai.search_stats_daily, and raw rows older than
+    retention_days are deleted about once an hour. When the queue is full new
+    rows are dropped and counted instead of slowing searches down. stop()
+    writes what is queued.
+    """
+
+    def __init__(self, queue_size: int, batch_size: int, flush_ms: float, retention_days: int = 0):
+        self.queue_size = max(1, queue_size)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_ms / 1000
+        self.retention_days = retention_days
+        self._pruned_at: float | None = None
+        self.pruned = 0
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self.write_ms_total = 0.0
+
+    def start(self):
+        self._queue = asyncio.Queue(self.queue_size)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        queue, self._queue = self._queue, None
+        await queue.put(_STOP)
+        try:
+            await asyncio.wait_for(self._task, timeout=10)
+        except asyncio.TimeoutError:
+            logger.warning("Search log writer did not flush in time")
+        self._task = None
+
+    def log(self, query: str, mode: str, results_count: int, latency_ms: float | None = None):
+        if self._queue is None:
+            self.dropped += 1
+            return
+        try:
+            self._queue.put_nowait(
+                (query, mode, results_count, latency_ms, datetime.now(timezone.utc))
+            )
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def _collect(self, queue: asyncio.Queue) -> tuple[list, bool]:
+        item = await queue.get()
+        if item is _STOP:
+            return [], True
+        batch = [item]
+        deadline = time.perf_counter() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _run(self):
+        queue = self._queue
+        stopping = False
+        while not stopping:
+            batch, stopping = await self._collect(queue)
+            if batch:
+                await self._write(batch)
+            await self._prune()
+
+    async def _write(self, batch: list):
+        started = time.perf_counter()
+        try:
+            async with db.pool.connection() as conn:
+                cur = conn.cursor()
+                async with cur.copy(
+                    "COPY ai.search_log (query, mode, results_count, latency_ms, created_at) FROM STDIN"
+                ) as copy:
+                    for row in batch:
+                        await copy.write_row(row)
+                await cur.executemany(UPSERT_DAILY_SQL, daily_rows(batch))
+        except Exception as e:
+            self.failed += len(batch)
+            logger.warning("Failed to write %d search log rows: %s", len(batch), e)
+            return
+        self.written += len(batch)
+        self.batches += 1
+        self.write_ms_total += (time.perf_counter() - started) * 1000
+
+    async def _prune(self):
+        if self.retention_days <= 0:
+            return
+        now = time.monotonic()
+        if self._pruned_at is not None and now - self._pruned_at < PRUNE_INTERVAL:
+            return
+        self._pruned_at = now
+        try:
+            async with db.pool.connection() as conn:
+                cur = await conn.execute(
+                    "DELETE FROM ai.search_log WHERE created_at < NOW() - make_interval(days => %s)",
+                    (self.retention_days,),
+                )
+                self.pruned += cur.rowcount
+        except Exception as e:
+            logger.warning("Failed to prune search log: %s", e)
+
+    def stats(self) -> dict:
+        return {
+            "queue_size": self.queue_size,
+            "batch_size": self.batch_size,
+            "flush_ms": self.flush_interval * 1000,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "batches": self.batches,
+            "pruned": self.pruned,
+            "retention_days": self.retention_days,
+            "avg_batch_size": round(self.written / self.batches, 2) if self.batches else 0.0,
+            "write_ms_avg": round(self.write_ms_total / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+writer = SearchLogWriter(
+    SEARCH_LOG_QUEUE_SIZE, SEARCH_LOG_BATCH_SIZE, SEARCH_LOG_FLUSH_MS, SEARCH_LOG_RETENTION_DAYS,
+)
@@ -0,0 +1,51 @@
+import logging
+import time
+
+logger = logging.getLogger("search-api")
+
+
+class Startup:
+    """Startup phases of the service: what is ready, how long each phase took."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.phases: dict[str, float] = {}
+        self.errors: dict[str, str] = {}
+        self.db_ready = False
+        self.model_ready = False
+
+    async def run(self, phase: str, fn, *args):
+        """Await fn(*args) as a named phase, recording its duration or error."""
+        started = time.perf_counter()
+        try:
+            result = await fn(*args)
+        except Exception as e:
+            self.errors[phase] = str(e)
+            logger.exception("Startup phase %s failed", phase)
+            raise
+        self.phases[phase] = round(time.perf_counter() - started, 3)
+        logger.info("Startup phase %s done in %.2fs", phase, self.phases[phase])
+        return result
+
+    @property
+    def ready(self) -> bool:
+        return self.db_ready and self.model_ready
+
+    def capabilities(self) -> dict:
+        return {
+            "fts": self.db_ready,
+            "vector": self.ready,
+            "hybrid": self.ready,
+            "index": self.ready,
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            "ready": self.ready,
+            "db_ready": self.db_ready,
+            "model_ready": self.model_ready,
+            "capabilities": self.capabilities(),
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "phases": self.phases,
+            "errors": self.errors,
+        }
@@ -0,0 +1,173 @@
+import logging
+import time
+
+import psycopg
+
+from app.config import (
+    EMBEDDING_DIM, VECTOR_INDEX, HNSW_M, HNSW_EF_CONSTRUCTION, HNSW_EF_SEARCH,
+    IVFFLAT_LISTS, IVFFLAT_PROBES, VECTOR_STORAGE, RESCORE_CANDIDATES,
+)
+from app.db import CONNINFO
+
+logger = logging.getLogger("search-api")
+
+METHODS = ("hnsw", "ivfflat")
+
+# What the ANN index stores: the fp32 vector itself, or a compact
+# halfvec / binary-quantized expression over it (rescored in fp32).
+STORAGES = ("vector", "halfvec", "binary")
+
+# ANN-indexed tables and the prefix of their index names.
+TABLES = {
+    "ai.embeddings": "idx_embeddings_embedding",
+    "ai.chunks": "idx_chunks_embedding",
+}
+
+
+def index_name(table: str, method: str = VECTOR_INDEX, storage: str = VECTOR_STORAGE) -> str:
+    suffix = "" if storage == "vector" else f"_{storage}"
+    return f"{TABLES[table]}_{method}{suffix}"
+
+
+def index_target(storage: str = VECTOR_STORAGE) -> str:
+    if storage == "halfvec":
+        return f"((embedding::halfvec({EMBEDDING_DIM})) halfvec_cosine_ops)"
+    if storage == "binary":
+        return f"((binary_quantize(embedding)::bit({EMBEDDING_DIM})) bit_hamming_ops)"
+    return "(embedding vector_cosine_ops)"
+
+
+def distance_sql(storage: str = VECTOR_STORAGE) -> str:
+    """First-pass distance to %(vec)s; matches the index expression of the storage."""
+    if storage == "halfvec":
+        return f"embedding::halfvec({EMBEDDING_DIM}) <=> %(vec)s::halfvec({EMBEDDING_DIM})"
+    if storage == "binary":
+        return f"binary_quantize(embedding)::bit({EMBEDDING_DIM}) <~> binary_quantize(%(vec)s::vector)"
+    return "embedding <=> %(vec)s::vector"
+
+
+def nearest_sql(table: str, key: str, limit: str = "n", storage: str = VECTOR_STORAGE,
+                rescore: int = RESCORE_CANDIDATES) -> str:
+    """Subquery of the %(limit)s rows nearest to %(vec)s as (key, vec_score).
+
+    With compact storage the index is searched for max(rescore, limit)
+    candidates, which are then re-ranked by exact fp32 cosine distance.
+    """
+    if storage == "vector":
+        return f"""
+            SELECT {key}, 1 - (embedding <=> %(vec)s::vector) AS vec_score
+            FROM {table}
+            ORDER BY embedding <=> %(vec)s::vector
+            LIMIT %({limit})s
+        """
+    return f"""
+        SELECT {key}, 1 - (embedding <=> %(vec)s::vector) AS vec_score
+        FROM (
+            SELECT {key}, embedding
+            FROM {table}
+            ORDER BY {distance_sql(storage)}
+            LIMIT GREATEST({rescore}, %({limit})s)
+        ) candidates
+        ORDER BY embedding <=> %(vec)s::vector
+        LIMIT %({limit})s
+    """
+
+
+def create_index_sql(table: str, name: str, concurrently: bool = False,
+                     storage: str = VECTOR_STORAGE) -> str:
+    if VECTOR_INDEX == "ivfflat":
+        method, options = "ivfflat", f"lists = {IVFFLAT_LISTS}"
+    else:
+        method, options = "hnsw", f"m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION}"
+    return f"""
+        CREATE INDEX {"CONCURRENTLY " if concurrently else ""}IF NOT EXISTS {name}
+        ON {table} USING {method} {index_target(storage)}
+        WITH ({options})
+    """
+
+
+def stale_index_names(table: str) -> list[str]:
+    """ANN index names for every method/storage layout except the configured one."""
+    current = index_name(table)
+    return [
+        name
+        for method in METHODS
+        for storage in STORAGES
+        if (name := index_name(table, method, storage)) != current
+    ]
+
+
+def ensure_index(cur: psycopg.Cursor, table: str = "ai.embeddings"):
+    """Create the configured ANN index at startup if it does not exist yet.
+
+    Indexes of another method or storage layout are dropped, so switching
+    VECTOR_INDEX / VECTOR_STORAGE migrates the index on the next start;
+    VECTOR_INDEX=none drops them all.
+    """
+    if VECTOR_INDEX == "none":
+        for stale in stale_index_names(table):
+            cur.execute(f"DROP INDEX IF EXISTS ai.{stale}")
+        return
+    if VECTOR_INDEX not in METHODS:
+        return
+    if VECTOR_STORAGE not in STORAGES:
+        raise ValueError(f"Unknown VECTOR_STORAGE: {VECTOR_STORAGE!r} (expected one of {STORAGES})")
+    cur.execute(create_index_sql(table, index_name(table)))
+    for stale in stale_index_names(table):
+        cur.execute(f"DROP INDEX IF EXISTS ai.{stale}")
+
+
+async def apply_search_params(cur: psycopg.AsyncCursor, limit: int,
+                              ef_search: int | None = None, probes: int | None = None):
+    """Set ANN recall knobs for the current transaction.
+
+    HNSW returns at most ef_search rows, so it is raised to at least limit
+    (or the rescoring candidate count with compact storage).
+    """
+    if VECTOR_STORAGE != "vector":
+        limit = max(limit, RESCORE_CANDIDATES)
+    if VECTOR_INDEX == "hnsw":
+        value = max(ef_search or HNSW_EF_SEARCH, limit)
+        await cur.execute("SELECT set_config('hnsw.ef_search', %s, true)", (str(value),))
+    elif VECTOR_INDEX == "ivfflat":
+        value = probes or IVFFLAT_PROBES
+        await cur.execute("SELECT set_config('ivfflat.probes', %s, true)", (str(value),))
+
+
+async def rebuild() -> dict:
+    """Build fresh indexes concurrently, then swap them in for the old ones."""
+    if VECTOR_INDEX not in METHODS:
+        raise ValueError(f"VECTOR_INDEX={VECTOR_INDEX!r} has no ANN index to rebuild")
+    started = time.perf_counter()
+
+    async with await psycopg.AsyncConnection.connect(CONNINFO, autocommit=True) as conn:
+        for table in TABLES:
+            name = index_name(table)
+            tmp_name = f"{name}_new"
+            await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS ai.{tmp_name}")
+            await conn.execute(create_index_sql(table, tmp_name, concurrently=True))
+            for stale in stale_index_names(table):
+                await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS ai.{stale}")
+            await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS ai.{name}")
+            await conn.execute(f"ALTER INDEX ai.{tmp_name} RENAME TO {name}")
+            logger.info("Rebuilt vector index %s", name)
+        info = await index_info(conn)
+
+    elapsed = time.perf_counter() - started
+    return {**info, "rebuild_seconds": round(elapsed, 3)}
+
+
+async def index_info(conn: psycopg.AsyncConnection) -> dict:
+    cur = await conn.execute("""
+        SELECT i.indrelid::regclass::text, c.relname, am.amname, pg_relation_size(c.oid)
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        JOIN pg_am am ON am.oid = c.relam
+        WHERE i.indrelid IN ('ai.embeddings'::regclass, 'ai.chunks'::regclass)
+          AND am.amname IN ('hnsw', 'ivfflat')
+    """)
+    indexes = [
+        {"table": r[0], "name": r[1], "method": r[2], "size_bytes": r[3]}
+        for r in await cur.fetchall()
+    ]
+    return {"configured": VECTOR_INDEX, "storage": VECTOR_STORAGE, "indexes": indexes}